@@ -0,0 +1,50 @@
+""" codec.py - JSON encoding and decoding, using orjson when it is installed and the standard library otherwise. """
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JsonCodec:
+    """Fast JSON (de)serialization that works on bytes, so payloads and records skip str round-trips"""
+
+    backend = "orjson" if orjson else "json"
+
+    @staticmethod
+    def loads(content):
+        """Decode JSON from bytes or str"""
+        if orjson:
+            return orjson.loads(content)
+        return json.loads(content)
+
+    @staticmethod
+    def dumps(obj):
+        """Encode to compact UTF-8 JSON bytes"""
+        if orjson:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:  # e.g. integers beyond 64 bits, which only the standard library encodes
+                pass
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def dumps_line(obj):
+        """Encode as one newline-terminated JSON line, for JSONL files"""
+        if orjson:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+            except TypeError:
+                pass
+        return JsonCodec.dumps(obj) + b"\n"
+
+    @staticmethod
+    def load(file):
+        """Decode JSON from a file opened in binary or text mode"""
+        return JsonCodec.loads(file.read())
+
+    @staticmethod
+    def dump(obj, file):
+        """Encode JSON into a file opened in binary mode"""
+        file.write(JsonCodec.dumps(obj))
@@ -3,15 +3,33 @@ import os
 import csv
 from bs4 import BeautifulSoup
 from curl_cffi.requests import AsyncSession
-import json
 import time
-from random import randint
 import re
-from Scraper.utils import CommonFunctions
+from Scraper.utils import CommonFunctions, FetchError
+from Scraper.concurrency import WorkerPool
+from Scraper.codec import JsonCodec
 
 class Collector:
     """Handles collecting property listings from search results pages"""
     
+    @staticmethod
+    def extract_house_links(html):
+        """Extract links to individual property listings from the raw HTML of a search results page"""
+        if not html:
+            return None
+        
+        script_content = CommonFunctions.extract_script_content(html, 'type', 'application/ld+json')
+        if script_content:
+            try:
+                data = JsonCodec.loads(script_content)
+                house_links = set()
+                for url_link in data['itemListElement']:
+                    house_links.add(url_link['url'])
+                return house_links
+            except Exception as e:
+                print(f"Failed to extract script from page: {e}")
+        return None
+
     @staticmethod
     def extract_house_links_from_soup(soup):
         """Extract links to individual property listings from search results page"""
@@ -21,7 +39,7 @@ class Collector:
         script_tag = soup.find('script', {'type': 'application/ld+json'})
         if script_tag:
             try:
-                data = json.loads(script_tag.string)
+                data = JsonCodec.loads(script_tag.string)
                 house_links = set()
                 for url_link in data['itemListElement']:
                     house_links.add(url_link['url'])
@@ -31,51 +49,132 @@ class Collector:
         return None
     
     @staticmethod
-    async def fetch_house_links_page(url, session):
-        """Fetch a search results page and extract property links"""
-        soup = await CommonFunctions.fetch_html_from_url(url, session)
-        if soup:
-            return Collector.extract_house_links_from_soup(soup)
-        return None
-    
-    @staticmethod
-    async def fetch_house_links_from_multiple_pages_async(url, session, batch_size=10):
-        """Fetch property links from multiple search result pages"""
-        all_house_links = set()
-        page_number = 1
-        found_last_page = False
+    async def iter_house_links(url, session, batch_size=10, max_pages=700, number_results=None, results_per_page=15,
+                               on_failed=None):
+        """
+        Yield the property links of each search result page as soon as that page is fetched.
+
+        With number_results known, exactly the pages holding those results are fetched. Otherwise
+        pages are requested until one comes back empty or with a non-retryable error. Failed pages
+        are retried later by the worker pool without holding up the others; a page that fails for
+        good is skipped, without ending the results, and on_failed(page_url, error, attempts) is
+        called for it.
+        """
+        page_results = asyncio.Queue()
+        last_page = max_pages - 1
+        if number_results is not None:
+            last_page = min(last_page, Collector.count_result_pages(number_results, results_per_page))
+        pages_collected = 0
+
+        # Workers take page numbers in order; pages past a discovered end are skipped without a request
+        page_queue = asyncio.Queue()
+        for page_number in range(1, last_page + 1):
+            page_queue.put_nowait(page_number)
+        page_queue.put_nowait(WorkerPool.DONE)
 
-        while not found_last_page and page_number < 700:
+        def page_empty(page_number):
+            nonlocal last_page
+            if number_results is None:  # Found last page
+                last_page = min(last_page, page_number - 1)
+            else:
+                print(f"No links found on page {page_number}, skipping it")
+
+        def page_url(page_number):
+            return f"{url}&search_result={page_number}"
+
+        async def fetch_page(page_number):
+            nonlocal pages_collected
+            if page_number > last_page:
+                return None
             try:
-                # Process pages by batch
-                await asyncio.sleep(2 + randint(0, 3))
-                current_batch_urls = [f"{url}&search_result={page_number + i}" 
-                                     for i in range(batch_size)]
-                current_batch_tasks = [Collector.fetch_house_links_page(batch_url, session) 
-                                      for batch_url in current_batch_urls]
-
-                current_batch_results = await asyncio.gather(*current_batch_tasks)
-
-                valid_results = []
-                for result in current_batch_results:
-                    if result is None:  # Found last page or error
-                        found_last_page = True
-                        break
-                    valid_results.append(result)
-
-                if not valid_results:
+                html = await CommonFunctions.fetch_page(page_url(page_number), session, stage="collect")
+            except FetchError as e:
+                # Without a known result count an error page just marks the end of the results
+                if e.retryable or number_results is not None:
+                    raise
+                page_empty(page_number)
+                return None
+
+            links = Collector.extract_house_links(html)
+            if not links:
+                page_empty(page_number)
+            elif page_number <= last_page:
+                page_results.put_nowait(links)
+                pages_collected += 1
+                if pages_collected % batch_size == 0:
+                    print(f"Collected url links from {pages_collected} pages")
+            return links
+
+        def page_failed(page_number, error, attempts):
+            # Failing for good does not mean the results ended there, so later pages are still fetched
+            if on_failed:
+                on_failed(page_url(page_number), error, attempts)
+
+        async def run_workers():
+            try:
+                await WorkerPool.run_from_queue(
+                    page_queue, fetch_page, concurrency=min(batch_size, last_page), keep_results=False,
+                    retry_policy=CommonFunctions.retry_policy, on_failed=page_failed
+                )
+            finally:
+                page_results.put_nowait(None)
+
+        workers_task = asyncio.create_task(run_workers())
+        try:
+            while True:
+                links = await page_results.get()
+                if links is None:
                     break
+                yield links
+        finally:
+            workers_task.cancel()
 
-                for links in valid_results:
-                    all_house_links.update(links)
+    @staticmethod
+    async def iter_page_links(page_urls, session, batch_size=10, on_failed=None):
+        """
+        Yield (page_url, links) for each of the given search result pages as soon as it is fetched.
 
-                print(f"Collected url links up to page {page_number + len(valid_results) - 1}")
-                page_number += batch_size
+        Pages are retried like in iter_house_links; on_failed(page_url, error, attempts) is called
+        for pages that fail for good.
+        """
+        if not page_urls:
+            return
+        page_results = asyncio.Queue()
 
-            except Exception as e:
-                print(f"Error while processing page {page_number}: {e}")
-                found_last_page = True
+        async def fetch_page(page_url):
+            html = await CommonFunctions.fetch_page(page_url, session, stage="collect")
+            page_results.put_nowait((page_url, Collector.extract_house_links(html) or set()))
 
+        async def run_workers():
+            try:
+                await WorkerPool.run(
+                    page_urls, fetch_page, concurrency=batch_size,
+                    retry_policy=CommonFunctions.retry_policy, on_failed=on_failed
+                )
+            finally:
+                page_results.put_nowait(None)
+
+        workers_task = asyncio.create_task(run_workers())
+        try:
+            while True:
+                result = await page_results.get()
+                if result is None:
+                    break
+                yield result
+        finally:
+            workers_task.cancel()
+
+    @staticmethod
+    def count_result_pages(number_results, results_per_page=15):
+        """Number of search result pages needed to list number_results properties"""
+        return -(-number_results // results_per_page)
+
+    @staticmethod
+    async def fetch_house_links_from_multiple_pages_async(url, session, batch_size=10, max_pages=700, number_results=None, results_per_page=15):
+        """Fetch property links from multiple search result pages"""
+        all_house_links = set()
+        async for links in Collector.iter_house_links(url, session, batch_size, max_pages, number_results, results_per_page):
+            all_house_links.update(links)
         return all_house_links
 
 async def main():
@@ -0,0 +1,504 @@
+""" concurrency.py - Shared request pacing and worker pools for the async scraping stages. """
+import asyncio
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+class TokenBucket:
+    """Token-bucket limiter shared by all outgoing requests, with optional per-stage sub-budgets"""
+
+    def __init__(self, rate=4.0, burst=8, stage_shares=None):
+        """
+        Args:
+            rate: Sustained requests per second
+            burst: Number of requests that may go out back-to-back after an idle period
+            stage_shares: Optional {stage: fraction} capping each stage at a share of the rate,
+                so one stage cannot use the whole budget while others are waiting
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self.stage_buckets = {
+            stage: TokenBucket(rate * share, max(1, burst * share))
+            for stage, share in (stage_shares or {}).items()
+        }
+
+    def _reserve(self):
+        """Take a token, going into debt if needed, and return how long to wait before using it"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return max(0.0, -self._tokens / self.rate)
+
+    def reserve(self, stage=None):
+        """Reserve a request from the global budget and the stage's sub-budget"""
+        wait_time = self._reserve()
+        stage_bucket = self.stage_buckets.get(stage)
+        if stage_bucket:
+            wait_time = max(wait_time, stage_bucket._reserve())
+        return wait_time
+
+    async def acquire(self, stage=None):
+        """Wait until a request may be sent"""
+        wait_time = self.reserve(stage)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    def acquire_sync(self, stage=None):
+        """Blocking variant of acquire for synchronous callers"""
+        wait_time = self.reserve(stage)
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight requests: grows additively while responses are healthy, shrinks multiplicatively on congestion"""
+
+    def __init__(self, initial=5, minimum=1, maximum=20, healthy_latency=3.0, decrease_factor=0.5, decrease_cooldown=1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.healthy_latency = healthy_latency
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.window = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+
+    @property
+    def current_window(self):
+        """Number of requests currently allowed in flight"""
+        return int(self.window)
+
+    async def acquire(self):
+        """Wait for a free slot in the current window and claim it"""
+        while self.in_flight >= self.current_window:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.in_flight += 1
+
+    def release(self, latency=None, congested=False):
+        """
+        Free a slot and adjust the window from the request outcome.
+
+        Args:
+            latency: Seconds the request took, or None if it failed without a response
+            congested: True on 429, 5xx or timeout responses
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if congested:
+            # Cut at most once per cooldown so one burst of failures does not collapse the window
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.window = max(self.minimum, self.window * self.decrease_factor)
+                self._last_decrease = now
+        elif latency is not None and latency <= self.healthy_latency:
+            # +1 per window's worth of healthy responses
+            self.window = min(self.maximum, self.window + 1 / self.window)
+
+        while self._waiters and self.in_flight < self.current_window:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for requests that failed with a retryable error"""
+
+    def __init__(self, max_attempts=5, base_delay=1.0, factor=3.0, max_delay=60.0, max_retry_after=300.0):
+        """
+        Args:
+            max_attempts: Attempts per item, including the first
+            base_delay: Backoff before the first retry, in seconds
+            factor: Backoff multiplier per further retry
+            max_delay: Cap on the backoff
+            max_retry_after: Cap on how long a server's Retry-After is honored
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retrying after the given failed attempt.
+
+        The backoff is jittered between half and all of base_delay * factor ** (attempt - 1),
+        so retries of a burst of failures spread out, and never undercuts Retry-After.
+        """
+        backoff = min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
+        delay = random.uniform(backoff / 2, backoff)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+
+class _Retry:
+    """A work item coming back from the retry scheduler, with the attempts it has used"""
+
+    __slots__ = ("item", "attempts")
+
+    def __init__(self, item, attempts):
+        self.item = item
+        self.attempts = attempts
+
+
+class WorkerPool:
+    """Bounded-concurrency pool where each worker picks up a new item as soon as it finishes one"""
+
+    # Put on a queue to tell the workers no more items will follow
+    DONE = object()
+
+    @staticmethod
+    async def run(items, handler, concurrency, on_done=None, retry_policy=None, on_failed=None):
+        """
+        Run handler over all items with at most `concurrency` in flight.
+
+        Args:
+            items: Iterable of work items
+            handler: Coroutine function called with a single item
+            concurrency: Number of workers
+            on_done: Optional callback called with (item, result) after each item
+            retry_policy: Optional RetryPolicy for items whose handler raises an error with a
+                truthy `retryable` attribute
+            on_failed: Optional callback called with (item, error, attempts) for items that
+                failed for good
+
+        Returns:
+            List of truthy handler results, in completion order
+        """
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+        n_workers = min(concurrency, queue.qsize())
+        queue.put_nowait(WorkerPool.DONE)
+        return await WorkerPool.run_from_queue(
+            queue, handler, n_workers, on_done, retry_policy=retry_policy, on_failed=on_failed
+        )
+
+    @staticmethod
+    async def run_from_queue(queue, handler, concurrency, on_done=None, keep_results=True, retry_policy=None, on_failed=None):
+        """
+        Run handler over items arriving on a (possibly bounded) queue until WorkerPool.DONE is read.
+
+        Lets a producer keep feeding work while the workers are already busy.
+        Takes the same arguments and returns the same results as run; with keep_results=False
+        results are only passed to on_done and nothing is accumulated.
+
+        A retryable failure does not hold a worker: the item is put back on the queue once its
+        backoff (or the error's retry_after) has passed, and the worker moves on right away.
+        The pool only finishes when WorkerPool.DONE has been read and no retries are pending.
+        """
+        results = []
+        loop = asyncio.get_running_loop()
+        retry_timers = set()
+        pending_retries = 0
+        done_received = False
+
+        def requeue(retry):
+            # Bounded queues may be full, so the put waits in its own task instead of the timer callback
+            asyncio.ensure_future(queue.put(retry))
+
+        def schedule_retry(item, attempts, error):
+            nonlocal pending_retries
+            delay = retry_policy.delay(attempts, getattr(error, "retry_after", None))
+            print(f"{error}. Retrying in {delay:.1f} seconds...")
+            pending_retries += 1
+            retry_timers.add(loop.call_later(delay, requeue, _Retry(item, attempts)))
+
+        async def worker():
+            nonlocal pending_retries, done_received
+            while True:
+                entry = await queue.get()
+                if entry is WorkerPool.DONE:
+                    if pending_retries:
+                        # Retries are still to come back; whoever finishes the last one passes DONE on
+                        done_received = True
+                        continue
+                    # Leave the marker for the other workers
+                    queue.put_nowait(WorkerPool.DONE)
+                    return
+
+                item, attempts = entry, 0
+                if isinstance(entry, _Retry):
+                    item, attempts = entry.item, entry.attempts
+                    pending_retries -= 1
+                finished = True
+                try:
+                    result = await handler(item)
+                except Exception as e:
+                    result = None
+                    if retry_policy and getattr(e, "retryable", False) and attempts + 1 < retry_policy.max_attempts:
+                        schedule_retry(item, attempts + 1, e)
+                        finished = False
+                    else:
+                        print(f"Worker failed on {item}: {e}")
+                        if on_failed:
+                            on_failed(item, e, attempts + 1)
+
+                if finished:
+                    if result and keep_results:
+                        results.append(result)
+                    if on_done:
+                        on_done(item, result)
+                if done_received and not pending_retries:
+                    done_received = False
+                    queue.put_nowait(WorkerPool.DONE)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            for timer in retry_timers:
+                timer.cancel()
+        return results
+
+    @staticmethod
+    async def run_stage(in_queue, out_queue, handler, concurrency, stats=None, retry_policy=None, on_failed=None):
+        """
+        Run one stage of a pipeline of bounded queues until WorkerPool.DONE, then pass DONE on.
+
+        Results other than None are put on out_queue; when it is full the stage's workers wait,
+        so a slow downstream stage holds back the ones feeding it instead of letting items pile up.
+        Failed items are retried and reported as in run_from_queue.
+
+        Args:
+            in_queue: Queue the stage reads items from
+            out_queue: Queue results are put on, or None for a final stage
+            handler: Coroutine function called with a single item
+            concurrency: Number of workers
+            stats: Optional StageStats recording the handler's service time and in_queue's depth
+            retry_policy: Optional RetryPolicy, as in run
+            on_failed: Optional callback called with (item, error, attempts), as in run
+        """
+        async def process(item):
+            if stats:
+                stats.sample_depth()
+            start_time = time.monotonic()
+            result = await handler(item)
+            if stats:
+                stats.record(time.monotonic() - start_time)
+            if result is not None and out_queue is not None:
+                await out_queue.put(result)
+
+        await WorkerPool.run_from_queue(
+            in_queue, process, concurrency, keep_results=False, retry_policy=retry_policy, on_failed=on_failed
+        )
+        if out_queue is not None:
+            await out_queue.put(WorkerPool.DONE)
+
+
+    @staticmethod
+    async def run_batch_stage(in_queue, out_queue, handler, max_batch, concurrency=1, stats=None, item_handler=None,
+                              on_failed=None):
+        """
+        Run a batch stage of a pipeline of bounded queues until WorkerPool.DONE, then pass DONE on.
+
+        Each worker takes whatever has queued up, up to max_batch items, and hands it to the
+        handler in one call, so vectorized work gets larger batches exactly when the stage
+        falls behind. Results other than None are put on out_queue as in run_stage. When a batch
+        fails and item_handler is given, its items are handled one at a time instead, so a single
+        bad item only fails itself.
+
+        Args:
+            in_queue: Queue the stage reads items from
+            out_queue: Queue results are put on, or None for a final stage
+            handler: Coroutine function called with a list of items, returning one result per item
+            max_batch: Largest number of items passed to one handler call
+            concurrency: Number of workers
+            stats: Optional StageStats recording the handler's service time and in_queue's depth
+            item_handler: Optional coroutine function called with a single item, used for the
+                items of a batch whose handler raised
+            on_failed: Optional callback called with (item, error, attempts) for each item that
+                failed, on its own or, without item_handler, as part of a batch
+        """
+        async def worker():
+            done = False
+            while not done:
+                if stats:
+                    stats.sample_depth()
+                batch = []
+                item = await in_queue.get()
+                while item is not WorkerPool.DONE:
+                    batch.append(item)
+                    if len(batch) >= max_batch or in_queue.empty():
+                        break
+                    item = in_queue.get_nowait()
+                done = item is WorkerPool.DONE
+                if done:
+                    # Leave the marker for the other workers
+                    in_queue.put_nowait(WorkerPool.DONE)
+                if not batch:
+                    continue
+
+                start_time = time.monotonic()
+                try:
+                    results = await handler(batch)
+                except Exception as e:
+                    print(f"Batch of {len(batch)} items failed: {e}")
+                    results = []
+                    for failed_item in batch:
+                        try:
+                            if item_handler is None:
+                                raise e
+                            results.append(await item_handler(failed_item))
+                        except Exception as item_error:
+                            if item_handler is not None:
+                                print(f"Worker failed on {failed_item}: {item_error}")
+                            if on_failed:
+                                on_failed(failed_item, item_error, 1)
+                if stats:
+                    stats.record(time.monotonic() - start_time, items=len(batch))
+                if out_queue is not None:
+                    for result in results:
+                        if result is not None:
+                            await out_queue.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        if out_queue is not None:
+            await out_queue.put(WorkerPool.DONE)
+
+
+class StageStats:
+    """
+    Items handled, service time and input queue depth of one stage of a queue-connected pipeline.
+
+    Handlers that wait for a shared budget (the fetch stage's rate limiter and concurrency window)
+    report that wait through add_wait; it is subtracted from the service time and shown on its own.
+    """
+
+    def __init__(self, name, queue=None):
+        """
+        Args:
+            name: Stage name shown in summaries
+            queue: The stage's input queue, sampled each time an item is taken from it
+        """
+        self.name = name
+        self.queue = queue
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.depth_total = 0
+        self.depth_samples = 0
+        self.max_depth = 0
+
+    def sample_depth(self):
+        """Record the current depth of the input queue"""
+        if self.queue is not None:
+            depth = self.queue.qsize()
+            self.depth_total += depth
+            self.depth_samples += 1
+            self.max_depth = max(self.max_depth, depth)
+
+    def record(self, service_time, items=1):
+        """Record items handled in service_time seconds"""
+        self.items += items
+        self.busy_time += service_time
+
+    def add_wait(self, wait_time):
+        """Record time a handler spent waiting for a shared budget, included in its service time"""
+        self.wait_time += wait_time
+
+    @property
+    def mean_service_time(self):
+        return (self.busy_time - self.wait_time) / self.items if self.items else 0.0
+
+    @property
+    def mean_wait_time(self):
+        return self.wait_time / self.items if self.items else 0.0
+
+    @property
+    def mean_depth(self):
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
+
+    def summary(self):
+        """One-line summary, e.g. 'fetch: 120 items, 210.3 ms/item + 95.0 ms/item waiting, queue avg 3.1 max 20/20'"""
+        line = f"{self.name}: {self.items} items"
+        if self.busy_time:
+            line += f", {self.mean_service_time * 1000:.1f} ms/item"
+        if self.wait_time:
+            line += f" + {self.mean_wait_time * 1000:.1f} ms/item waiting"
+        if self.queue is not None:
+            capacity = f"/{self.queue.maxsize}" if self.queue.maxsize else ""
+            line += f", queue avg {self.mean_depth:.1f} max {self.max_depth}{capacity}"
+        return line
+
+
+def _apply_to_chunk(func, items):
+    """Run func over a chunk of items inside a worker process"""
+    return [func(item) for item in items]
+
+
+class ProcessPoolBatcher:
+    """Offloads CPU-bound work to a ProcessPoolExecutor, grouping items into chunks to amortise IPC"""
+
+    def __init__(self, func, workers=None, chunk_size=4, max_delay=0.05):
+        """
+        Args:
+            func: Picklable (module- or class-level) function applied to each item
+            workers: Number of worker processes, None for os.cpu_count()
+            chunk_size: Number of items sent to a worker in one task
+            max_delay: Seconds to wait for a chunk to fill before sending it anyway
+        """
+        self.func = func
+        self.chunk_size = chunk_size
+        self.max_delay = max_delay
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self._pending = []
+        self._flush_handle = None
+
+    async def submit(self, item):
+        """Queue an item for the pool and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        """Send all pending items to the pool as one chunk"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        chunk, self._pending = self._pending, []
+        items = [item for item, _ in chunk]
+        chunk_future = asyncio.get_running_loop().run_in_executor(
+            self.executor, _apply_to_chunk, self.func, items
+        )
+        chunk_future.add_done_callback(lambda done: self._resolve(chunk, done))
+
+    @staticmethod
+    def _resolve(chunk, chunk_future):
+        """Hand each item's result (or the chunk's error) back to its waiter"""
+        if chunk_future.cancelled():
+            error, results = asyncio.CancelledError(), None
+        else:
+            error = chunk_future.exception()
+            results = None if error else chunk_future.result()
+        for i, (_, future) in enumerate(chunk):
+            if future.done():
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    async def call(self, func, *args):
+        """Run a single picklable call in the pool, outside the chunking, and wait for its result"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self.executor.shutdown()
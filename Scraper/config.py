@@ -1,10 +1,16 @@
 # config.py - Configuration management
 import os
-import json
 import csv
-import re
+import time
 from random import randint
-from Scraper.utils import CleanerUtils
+from Scraper.codec import JsonCodec
+from Scraper.storage import JsonFileStorage, SegmentedStorage
+from Scraper.id_index import IdManifest
+from Scraper.journal import CompletionJournal
+from Scraper.dead_letter import DeadLetterStore
+from Scraper.response_cache import ResponseCache
+from Scraper.payload_archive import PayloadArchive
+from Scraper.locations import LocationCatalog
 
 class Config:
     def __init__(self, base_dir=None):
@@ -15,22 +21,113 @@ class Config:
         self.scraper_dir = os.path.join(self.base_dir, "Scraper/")
         self.data_dir = os.path.join(self.base_dir, "data/")
         self.scraped_data_dir = os.path.join(self.base_dir, "data/scraped/")
+        self.segments_dir = os.path.join(self.base_dir, "data/segments/")
+        self.response_cache_dir = os.path.join(self.base_dir, "data/http_cache/")
+        self.payload_archive_dir = os.path.join(self.base_dir, "data/payloads/")
         
         # Ensure directories exist
         os.makedirs(self.scraped_data_dir, exist_ok=True)
         
         # Set up file paths
         self.available_location_queries_file = os.path.join(self.data_dir, 'plaats_provinc_nl.csv')
+        self.location_catalog_cache_file = os.path.join(self.data_dir, 'plaats_provinc_nl.catalog.pickle')
         self.search_query_file = os.path.join(self.data_dir, 'search_query.json')
+        self.completion_journal_file = os.path.join(self.data_dir, 'completed.jsonl')
+        self.dead_letter_file = os.path.join(self.data_dir, 'failed.jsonl')
 
         # Constants for batch processing and wait time
         self.batch_processing_size = 20
+
+        # Listings per search result page, used to fetch exactly the pages a search needs
+        self.results_per_page = 15
+
+        # Bounded queue between search-page collection and detail workers, so both stages overlap
+        self.link_queue_size = 200
+
+        # Areas and neighborhoods scraped at the same time; they all share the request budget below
+        self.unit_concurrency = 4
+
+        # Failed requests (timeouts, 429, 5xx) are requeued with jittered exponential backoff
+        # (retry_base_delay * retry_backoff_factor ** n seconds, at most retry_max_delay) or the
+        # server's Retry-After, up to retry_max_attempts attempts; other work continues meanwhile
+        self.retry_max_attempts = 5
+        self.retry_base_delay = 1.0
+        self.retry_backoff_factor = 3.0
+        self.retry_max_delay = 60.0
+
+        # Seconds a search URL's result count stays cached before it is probed again
+        self.result_count_ttl = 600
+
+        # Shared token bucket for all outgoing requests: sustained rate, burst size, and the share
+        # of that rate each stage may use on its own (search pages, detail pages, result-count probes)
+        self.requests_per_second = 4.0
+        self.request_burst = 8
+        self.stage_rate_shares = {"collect": 0.6, "detail": 0.9, "probe": 0.3}
+
+        # Adaptive (AIMD) window on in-flight requests: grows while latency stays under
+        # healthy_latency seconds, halves on 429/5xx/timeouts. batch_processing_size caps it.
+        self.concurrency_initial = 5
+        self.concurrency_min = 1
+        self.healthy_latency = 3.0
+
+        # Detail pages pass through bounded queues between stages: fetch -> parse -> clean -> persist.
+        # stage_concurrency sets the workers of each stage; None derives it, as batch_processing_size
+        # for fetch and, for parse, enough pages to fill a chunk for every parse_workers process
+        # (1 without the process pool). stage_queue_size sets the capacity of each stage's input
+        # queue; a full queue pauses the stage before it, which bounds memory when parsing or
+        # writing falls behind. Parsing runs off the event loop (in the process pool with
+        # parse_in_processes), and each clean worker takes up to clean_batch_size queued records at
+        # a time and cleans them column by column, in the process pool too when it is enabled.
+        self.stage_concurrency = {"fetch": None, "parse": None, "clean": 1, "persist": 1}
+        self.stage_queue_size = {"parse": 20, "clean": 100, "persist": 100}
+        self.clean_batch_size = 100
+
+        # Opt-in: extract detail pages in a process pool so the event loop only does
+        # network I/O. parse_workers=None uses every core; pages are sent in chunks of parse_chunk_size.
+        self.parse_in_processes = False
+        self.parse_workers = None
+        self.parse_chunk_size = 4
+
+        # Scraped records are written as they are produced, flushed every save_flush_size records
+        # or, on a timer that also fires while fetching stalls, save_flush_interval seconds after
+        # the last flush, so a crash loses at most that many seconds of work
+        self.save_flush_size = 50
+        self.save_flush_interval = 10.0
+
+        # Storage layout for scraped listings: "files" keeps one {id}.json per listing in data/scraped/,
+        # "segments" appends to compressed JSONL segments of up to segment_max_bytes in data/segments/
+        self.storage_backend = "files"
+        self.segment_max_bytes = 64 * 1024 * 1024
+        self._storage = None
+
+        # Areas and neighborhoods completed less than this many days ago are skipped when a run
+        # resumes (None = skip them forever); older completions are scraped again for new listings
+        self.resume_max_age_days = 1
+
+        # Re-scrape stored listings once they are older than this many days (None = never refresh)
+        self.refresh_after_days = None
+
+        # Opt-in cache of fetched pages in data/http_cache/, zlib-compressed, so re-runs (e.g. while
+        # working on extraction) skip the network. Search pages and detail pages expire after their
+        # own TTL in seconds (None = never); the oldest pages are evicted beyond response_cache_max_bytes.
+        # response_cache_offline serves only cached pages, whatever their age, and sends no requests.
+        self.response_cache_enabled = False
+        self.response_cache_search_ttl = 6 * 3600
+        self.response_cache_detail_ttl = 7 * 86400
+        self.response_cache_max_bytes = 2 * 1024 ** 3
+        self.response_cache_offline = False
+
+        # Keep the raw __NUXT_DATA__ payload of every scraped listing in compressed segments in
+        # data/payloads/ (zstd with the zstandard package, zlib otherwise), so improved extraction
+        # or cleaning can be re-run over all listings with `python -m Scraper.reprocess`
+        self.archive_payloads = True
+        self.payload_segment_max_bytes = 256 * 1024 * 1024
     
     def load_search_query(self):
         """Load search query configuration from file"""
         try:
             with open(self.search_query_file, mode='r', encoding='utf-8') as file:
-                return json.load(file)
+                return JsonCodec.load(file)
         except Exception as e:
             print(f"Error loading search query: {e}")
             return {}
@@ -44,31 +141,104 @@ class Config:
             print(f"Error loading location queries: {e}")
             return []
     
+    def load_location_catalog(self):
+        """Load the indexed location catalog, cached next to the location queries CSV"""
+        try:
+            return LocationCatalog.load(self.available_location_queries_file, self.location_catalog_cache_file)
+        except Exception as e:
+            print(f"Error loading location catalog: {e}")
+            return LocationCatalog.from_rows([])
+
+    def get_storage(self):
+        """Get the storage backend selected by storage_backend, created on first use"""
+        if self._storage is None:
+            if self.storage_backend == "segments":
+                self._storage = SegmentedStorage(self.segments_dir, max_segment_bytes=self.segment_max_bytes)
+            elif self.storage_backend == "files":
+                self._storage = JsonFileStorage(self.scraped_data_dir)
+            else:
+                raise ValueError(f"Unknown storage backend: {self.storage_backend}")
+        return self._storage
+
+    def get_stage_concurrency(self, stage):
+        """Get the number of workers of a detail pipeline stage, deriving it where stage_concurrency is None"""
+        concurrency = self.stage_concurrency.get(stage)
+        if concurrency is not None:
+            return concurrency
+        if stage == "fetch":
+            return self.batch_processing_size
+        if stage == "parse" and self.parse_in_processes:
+            return (self.parse_workers or os.cpu_count() or 1) * self.parse_chunk_size
+        return 1
+
+    def get_id_manifest_file(self):
+        """Path of the persistent scraped-ID manifest for the selected storage backend"""
+        return os.path.join(self.data_dir, f"scraped_ids_{self.storage_backend}.bin")
+
+    def rebuild_id_manifest(self):
+        """Reconstruct the scraped-ID manifest from the stored listings"""
+        return IdManifest.rebuild(self.get_id_manifest_file(), self.get_storage().get_ids())
+
     def get_scraped_ids(self):
-        """Get set of already scraped property IDs"""
+        """Get set-like index of already scraped property IDs, built from storage on first use"""
         try:
-            return {int(re.findall(r'\d+', x)[0]) for x in os.listdir(self.scraped_data_dir) 
-                   if re.findall(r'\d+', x)}
+            manifest_file = self.get_id_manifest_file()
+            if not os.path.exists(manifest_file) and not os.path.exists(manifest_file + ".log"):
+                return self.rebuild_id_manifest()
+            return IdManifest(manifest_file)
         except Exception as e:
             print(f"Error getting scraped IDs: {e}")
             return set()
     
+    def get_scraped_timestamp(self, house_id):
+        """Get the time a stored property was last saved, or None if it is not stored"""
+        return self.get_storage().get_fetch_time(house_id)
+
+    def is_stale(self, house_id, now=None):
+        """Check whether a stored property is due for a refresh under refresh_after_days"""
+        if self.refresh_after_days is None:
+            return False
+        scraped_at = self.get_scraped_timestamp(house_id)
+        if scraped_at is None:
+            return True
+        now = now or time.time()
+        return now - scraped_at >= self.refresh_after_days * 86400
+
+    def get_response_cache(self):
+        """Get the response cache, or None when it is neither enabled nor needed for offline mode"""
+        if not (self.response_cache_enabled or self.response_cache_offline):
+            return None
+        return ResponseCache(
+            self.response_cache_dir,
+            ttls={
+                "collect": self.response_cache_search_ttl,
+                "probe": self.response_cache_search_ttl,
+                "detail": self.response_cache_detail_ttl,
+            },
+            default_ttl=self.response_cache_detail_ttl,
+            max_bytes=self.response_cache_max_bytes,
+            offline=self.response_cache_offline
+        )
+
+    def get_payload_archive(self):
+        """Get the archive of raw listing payloads"""
+        return PayloadArchive(self.payload_archive_dir, max_segment_bytes=self.payload_segment_max_bytes)
+
+    def get_completion_journal(self):
+        """Get the checkpoint journal of completed areas and neighborhoods"""
+        return CompletionJournal(self.completion_journal_file)
+
+    def get_dead_letter_store(self):
+        """Get the store of search pages and listings that failed after all retries"""
+        return DeadLetterStore(self.dead_letter_file)
+
     def get_scraped_neighborhoods(self):
-        """Get set of already scraped neighborhoods"""
-        scraped_neighborhoods = set()
-        for filename in os.listdir(self.scraped_data_dir):
-            if filename.endswith(".json"):
-                file_path = os.path.join(self.scraped_data_dir, filename)
-                try:
-                    with open(file_path, mode='r', encoding='utf-8') as file:
-                        data = json.load(file)
-                        city, neighborhood = data.get("city"), data.get("neighborhood")
-                        if city and neighborhood:
-                            scraped_neighborhoods.add(f'{city}/{neighborhood}')
-                except (json.JSONDecodeError, Exception) as e:
-                    continue
-        
-        return {CleanerUtils.clean_name(element) for element in scraped_neighborhoods}
+        """Get search URLs of neighborhoods completed within resume_max_age_days"""
+        return self.get_completion_journal().completed("neighborhood", self.resume_max_age_days)
+
+    def get_scraped_areas(self):
+        """Get search URLs of areas completed within resume_max_age_days"""
+        return self.get_completion_journal().completed("area", self.resume_max_age_days)
 
 if __name__ == "__main__":
     config = Config(base_dir=None)
@@ -0,0 +1,117 @@
+""" dates.py - Parsing of the Dutch listing dates shown on Funda, e.g. "3 weken", "Vandaag" or "12 januari 2024". """
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+
+class DutchDateParser:
+    """
+    Converts Funda's listing dates to 'dd/mm/yyyy' strings.
+
+    Relative dates ("3 weken", "6+ maanden", "Vandaag", "dinsdag") are resolved against a
+    reference time fixed when the parser is created, so every record of a run agrees on
+    what "today" is. Known formats are matched against lookup tables; anything else goes
+    through the original replace-and-strptime rules. Results are memoized per string.
+    """
+
+    DUTCH_MONTHS = {
+        "januari": 1, "februari": 2, "maart": 3, "april": 4, "mei": 5, "juni": 6,
+        "juli": 7, "augustus": 8, "september": 9, "oktober": 10, "november": 11, "december": 12,
+    }
+    MONTHS = {
+        **DUTCH_MONTHS,
+        "january": 1, "february": 2, "march": 3, "may": 5, "june": 6, "july": 7, "august": 8, "october": 10,
+    }
+    WEEKDAYS = {
+        "maandag": 0, "dinsdag": 1, "woensdag": 2, "donderdag": 3, "vrijdag": 4, "zaterdag": 5, "zondag": 6,
+    }
+    # Days per unit of a relative date
+    UNITS = {
+        "dag": 1, "dagen": 1, "day": 1, "days": 1,
+        "week": 7, "weken": 7, "weeks": 7,
+        "maand": 30, "maanden": 30, "month": 30, "months": 30,
+    }
+    # Days back for named days; "Vandaag" has always been stored as one day back
+    NAMED_DAYS = {"vandaag": 1, "today": 1}
+
+    RELATIVE_PATTERN = re.compile(r"(\d+)\+?\s*([a-z]+)")
+    ABSOLUTE_PATTERN = re.compile(r"(\d{1,2})\s+([a-z]+)\s+(\d{4})")
+
+    def __init__(self, reference_time=None, cache_size=4096):
+        """
+        Args:
+            reference_time: datetime relative dates are counted back from, defaults to now
+            cache_size: Number of distinct date strings to memoize
+        """
+        self.reference_time = reference_time or datetime.now()
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+        self._days_back = lru_cache(maxsize=None)(self._format_days_back)
+
+    def _format_days_back(self, days):
+        return (self.reference_time - timedelta(days=days)).strftime("%d/%m/%Y")
+
+    def _parse(self, x):
+        """Parse one date string, returning 'na' for dates that cannot be read"""
+        key = x.strip().lower()
+
+        if key in self.NAMED_DAYS:
+            return self._days_back(self.NAMED_DAYS[key])
+        if key in self.WEEKDAYS:
+            return self._days_back((self.reference_time.weekday() - self.WEEKDAYS[key]) % 7)
+
+        match = self.RELATIVE_PATTERN.fullmatch(key)
+        if match and match.group(2) in self.UNITS:
+            return self._days_back(int(match.group(1)) * self.UNITS[match.group(2)])
+
+        match = self.ABSOLUTE_PATTERN.fullmatch(key)
+        if match and match.group(2) in self.MONTHS:
+            try:
+                return datetime(int(match.group(3)), self.MONTHS[match.group(2)], int(match.group(1))).strftime("%d/%m/%Y")
+            except ValueError:
+                return "na"
+
+        return self._parse_fallback(x)
+
+    def _parse_fallback(self, x):
+        """The original free-form rules, for strings outside the known formats"""
+        x = x.replace("weken", "week").replace("maanden", "month").replace("Vandaag", "Today").replace("+", "")
+        for dutch, number in self.DUTCH_MONTHS.items():
+            x = x.replace(dutch, datetime(2000, number, 1).strftime("%B"))
+
+        try:
+            if x.find("month") != -1:
+                return self._days_back(int(x.split("month")[0].strip()[0]) * 30)
+            elif x.find("week") != -1:
+                return self._days_back(int(x.split("week")[0].strip()[0]) * 7)
+            elif x.find("Today") != -1:
+                return self._days_back(1)
+            elif x.find("day") != -1:
+                return self._days_back(int(x.split("day")[0].strip()))
+            return datetime.strptime(x, "%d %B %Y").strftime("%d/%m/%Y")
+        except ValueError:
+            return "na"
+
+    def parse_many(self, values, on_error=None):
+        """
+        Parse a column of date strings, each distinct value once.
+
+        Args:
+            values: Iterable of date strings
+            on_error: Called as on_error(value, exception) for values that raise; its return
+                value is used as the result. Without it the exception propagates.
+
+        Returns:
+            List of parsed dates, in the order of values
+        """
+        parsed = {}
+        results = []
+        for value in values:
+            try:
+                if value not in parsed:
+                    parsed[value] = self.parse(value)
+                results.append(parsed[value])
+            except Exception as e:
+                if on_error is None:
+                    raise
+                results.append(on_error(value, e))
+        return results
@@ -0,0 +1,95 @@
+""" dead_letter.py - Persistent record of search pages and listings that could not be fetched. """
+import os
+import time
+
+from Scraper.codec import JsonCodec
+
+
+class DeadLetterStore:
+    """
+    Append-only JSONL log of URLs that failed for good, so they can be retried without a full re-crawl.
+
+    Each line is either a failure (kind, url, reason, status code, attempts) or a resolution of
+    a URL that has since succeeded; the latest line for a URL wins. compact() rewrites the file
+    with only the unresolved failures.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pending = None
+
+    @property
+    def pending(self):
+        """{url: latest failure entry} of unresolved failures, loaded on first use"""
+        if self._pending is None:
+            self._pending = {}
+            for entry in self.iter_entries():
+                if entry.get("resolved"):
+                    self._pending.pop(entry.get("url"), None)
+                elif "url" in entry:
+                    self._pending[entry["url"]] = entry
+        return self._pending
+
+    def iter_entries(self):
+        """Yield all log lines, skipping a line torn by a crash"""
+        try:
+            with open(self.path, mode='rb') as log:
+                for line in log:
+                    try:
+                        yield JsonCodec.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            return
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'ab') as log:
+            log.write(JsonCodec.dumps_line(entry))
+
+    def record(self, kind, url, error, attempts, source=None):
+        """
+        Record a URL that exhausted its retries.
+
+        Args:
+            kind: "page" for a search results page, "detail" for a listing page
+            url: URL that failed
+            error: The final exception; a FetchError contributes its reason and status code
+            attempts: Attempts made in this run; added to those of earlier runs
+            source: Search URL or area the URL was first found through, for reference
+        """
+        previous = self.pending.get(url, {})
+        entry = {
+            "kind": kind,
+            "url": url,
+            "reason": getattr(error, "reason", None) or str(error),
+            "status_code": getattr(error, "status_code", None),
+            "attempts": previous.get("attempts", 0) + attempts,
+            "failed_at": time.time(),
+            "source": previous.get("source") or source,
+        }
+        self._append(entry)
+        self.pending[url] = entry
+
+    def resolve(self, url):
+        """Mark a previously failed URL as succeeded; a no-op for URLs that never failed"""
+        if url in self.pending:
+            self._append({"url": url, "resolved": True, "resolved_at": time.time()})
+            del self.pending[url]
+
+    def urls(self, kind):
+        """Get the unresolved failed URLs of a kind, oldest failure first"""
+        entries = sorted(self.pending.values(), key=lambda entry: entry.get("failed_at", 0))
+        return [entry["url"] for entry in entries if entry.get("kind") == kind]
+
+    def compact(self):
+        """Rewrite the log with only the unresolved failures"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as log:
+            for entry in self.pending.values():
+                log.write(JsonCodec.dumps_line(entry))
+        os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self.pending)
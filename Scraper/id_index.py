@@ -0,0 +1,127 @@
+""" id_index.py - Persistent index of scraped listing IDs that loads without scanning the data directory. """
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+
+
+class IdManifest:
+    """
+    Set-like, persistent index of scraped listing IDs.
+
+    IDs live in a sorted array of unsigned 64-bit integers that is memory-mapped and
+    binary-searched, so loading costs the same for a thousand IDs or millions of them.
+    IDs added since the last compaction are appended to a small log file next to it and
+    merged into the sorted array once the log grows past compact_threshold entries.
+    """
+
+    def __init__(self, path, compact_threshold=10000):
+        self.path = path
+        self.log_path = path + ".log"
+        self.compact_threshold = compact_threshold
+        self._file = None
+        self._mmap = None
+        self._ids = array('Q')
+        self._recent = set()
+        self._load()
+
+    def _load(self):
+        """Map the sorted array and read the log of recent additions"""
+        self._close_map()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self._file = open(self.path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._ids = memoryview(self._mmap).cast('Q')
+        else:
+            self._ids = array('Q')
+
+        self._recent = set()
+        if os.path.exists(self.log_path):
+            recent = array('Q')
+            with open(self.log_path, 'rb') as log:
+                data = log.read()
+            recent.frombytes(data[:len(data) - len(data) % recent.itemsize])
+            self._recent = {house_id for house_id in recent if not self._in_sorted(house_id)}
+
+    def _close_map(self):
+        if isinstance(self._ids, memoryview):
+            self._ids.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def _in_sorted(self, house_id):
+        position = bisect_left(self._ids, house_id)
+        return position < len(self._ids) and self._ids[position] == house_id
+
+    def __contains__(self, house_id):
+        if house_id is None:  # URLs without a numeric ID are never indexed
+            return False
+        return house_id in self._recent or self._in_sorted(house_id)
+
+    def __len__(self):
+        return len(self._ids) + len(self._recent)
+
+    def __iter__(self):
+        yield from self._ids
+        yield from self._recent
+
+    def add(self, house_id):
+        """Add a single ID"""
+        self.update([house_id])
+
+    def update(self, house_ids):
+        """Add IDs, persisting them to the log straight away; None (no numeric ID) is skipped"""
+        new_ids = array('Q', {house_id for house_id in house_ids if house_id is not None and house_id not in self})
+        if not new_ids:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.log_path, 'ab') as log:
+            new_ids.tofile(log)
+        self._recent.update(new_ids)
+        if len(self._recent) >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """Merge the logged IDs into the sorted array file and clear the log"""
+        house_ids = set(self)
+        self._close_map()
+        self.write(self.path, house_ids)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._load()
+
+    def close(self):
+        """Release the memory map"""
+        self._close_map()
+
+    @staticmethod
+    def write(path, house_ids):
+        """Write a sorted ID array file atomically"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            array('Q', sorted(house_ids)).tofile(file)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def rebuild(cls, path, house_ids):
+        """Replace the manifest at path with exactly house_ids"""
+        cls.write(path, house_ids)
+        if os.path.exists(path + ".log"):
+            os.remove(path + ".log")
+        return cls(path)
+
+
+if __name__ == "__main__":
+    # Rebuild the manifest from the stored listings: python -m Scraper.id_index rebuild
+    from Scraper.config import Config
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m Scraper.id_index rebuild")
+        sys.exit(1)
+    config = Config()
+    manifest = config.rebuild_id_manifest()
+    print(f"Rebuilt {config.get_id_manifest_file()} with {len(manifest)} IDs")
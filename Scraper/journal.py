@@ -0,0 +1,55 @@
+""" journal.py - Append-only checkpoint journal of completed areas and neighborhoods. """
+import os
+import time
+
+from Scraper.codec import JsonCodec
+
+
+class CompletionJournal:
+    """Records each finished area or neighborhood as one JSON line, so a run can resume without re-reading listings"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def record(self, kind, name, url, listings, saved):
+        """
+        Append a completion entry.
+
+        Args:
+            kind: "area" or "neighborhood"
+            name: Area or neighborhood query, e.g. "amsterdam/centrum"
+            url: Search URL that was processed, which also captures the search filters
+            listings: Number of listings found
+            saved: Number of listings saved
+        """
+        entry = {
+            "kind": kind,
+            "name": name,
+            "url": url,
+            "completed_at": time.time(),
+            "listings": listings,
+            "saved": saved,
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'ab') as journal:
+            journal.write(JsonCodec.dumps_line(entry))
+
+    def iter_entries(self):
+        """Yield all journal entries, skipping a line torn by a crash"""
+        try:
+            with open(self.path, mode='rb') as journal:
+                for line in journal:
+                    try:
+                        yield JsonCodec.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            return
+
+    def completed(self, kind, max_age_days=None):
+        """Get the search URLs of units of this kind completed within max_age_days (None = ever)"""
+        oldest = None if max_age_days is None else time.time() - max_age_days * 86400
+        return {
+            entry["url"] for entry in self.iter_entries()
+            if entry.get("kind") == kind and (oldest is None or entry.get("completed_at", 0) >= oldest)
+        }
@@ -0,0 +1,102 @@
+""" locations.py - Indexed catalog of searchable locations and their neighborhood queries. """
+import ast
+import csv
+import hashlib
+import os
+import pickle
+
+from Scraper.utils import CleanerUtils
+
+
+class LocationCatalog:
+    """Maps normalized plaats, gemeente and provincie names to their deduplicated neighborhood queries"""
+
+    LOCATION_TYPES = ("plaats", "gemeente", "provincie")
+    CACHE_VERSION = 1
+
+    def __init__(self, queries_by_type):
+        """
+        Args:
+            queries_by_type: {location type: {normalized name: [neighborhood queries]}}
+        """
+        self.queries_by_type = queries_by_type
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build the catalog from rows of plaats_provinc_nl.csv"""
+        rows = list(rows)
+        # Each location column is cleaned in one batch
+        names_by_type = {
+            location_type: CleanerUtils.clean_names(row[location_type] for row in rows)
+            for location_type in cls.LOCATION_TYPES
+        }
+        queries_by_type = {location_type: {} for location_type in cls.LOCATION_TYPES}
+        for index, row in enumerate(rows):
+            queries = row["query"]
+            if isinstance(queries, str):
+                queries = ast.literal_eval(queries) if queries else []
+            for location_type in cls.LOCATION_TYPES:
+                name = names_by_type[location_type][index]
+                queries_by_type[location_type].setdefault(name, {}).update(dict.fromkeys(queries))
+
+        return cls({
+            location_type: {name: list(queries) for name, queries in names.items()}
+            for location_type, names in queries_by_type.items()
+        })
+
+    @classmethod
+    def load(cls, csv_file, cache_file=None):
+        """
+        Load the catalog for a locations CSV, reusing the binary cache while the CSV is unchanged.
+
+        The cache is keyed on the CSV's modification time and size; when those differ the
+        file's SHA-1 decides whether the cached catalog is still valid.
+        """
+        stat = os.stat(csv_file)
+        cached = cls._read_cache(cache_file) if cache_file else None
+        if cached and (cached["mtime"], cached["size"]) == (stat.st_mtime, stat.st_size):
+            return cls(cached["queries_by_type"])
+
+        with open(csv_file, mode='rb') as file:
+            content = file.read()
+        digest = hashlib.sha1(content).hexdigest()
+        if cached and cached["sha1"] == digest:
+            catalog = cls(cached["queries_by_type"])
+        else:
+            catalog = cls.from_rows(csv.DictReader(content.decode('utf-8').splitlines()))
+
+        if cache_file:
+            catalog._write_cache(cache_file, stat, digest)
+        return catalog
+
+    @classmethod
+    def _read_cache(cls, cache_file):
+        try:
+            with open(cache_file, mode='rb') as file:
+                cached = pickle.load(file)
+            return cached if cached.get("version") == cls.CACHE_VERSION else None
+        except Exception:
+            return None
+
+    def _write_cache(self, cache_file, stat, digest):
+        try:
+            temp_file = cache_file + ".tmp"
+            with open(temp_file, mode='wb') as file:
+                pickle.dump({
+                    "version": self.CACHE_VERSION,
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "sha1": digest,
+                    "queries_by_type": self.queries_by_type,
+                }, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            print(f"Failed to write location catalog cache: {e}")
+
+    def names(self, location_type):
+        """Get all normalized names of a location type"""
+        return list(self.queries_by_type[location_type])
+
+    def get_queries(self, location_type, name):
+        """Get the neighborhood queries for a normalized location name, or an empty list"""
+        return self.queries_by_type[location_type].get(name, [])
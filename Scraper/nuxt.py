@@ -0,0 +1,170 @@
+""" nuxt.py - Lazy decoder for the flattened ("devalue") payload Nuxt embeds as __NUXT_DATA__. """
+from collections.abc import Mapping, Sequence
+
+from Scraper.codec import JsonCodec
+
+_UNRESOLVED = object()
+
+
+class NuxtPayload:
+    """
+    Read-only view of a Nuxt payload.
+
+    The payload is one flat JSON array. Objects and arrays in it hold integer indices of
+    their children elsewhere in the array instead of the children themselves, negative
+    indices stand for special values, and arrays starting with a string are typed values
+    such as ["Date", "2024-01-31T00:00:00.000Z"] or Nuxt's ["ShallowReactive", 1] wrappers.
+
+    Nodes are resolved only when they are accessed and each index is resolved once, so
+    reading a few fields of a listing costs the same whatever the size of the payload.
+    """
+
+    # Negative indices used for values JSON cannot represent
+    SPECIAL_VALUES = {
+        -1: None,  # undefined
+        -2: None,  # array hole
+        -3: float("nan"),
+        -4: float("inf"),
+        -5: float("-inf"),
+        -6: -0.0,
+    }
+    # Nuxt reactivity wrappers around a single value
+    WRAPPER_TYPES = {"ShallowReactive", "Reactive", "ShallowRef", "Ref", "NuxtError", "Island"}
+    EMPTY_TYPES = {"EmptyRef", "EmptyShallowRef"}
+
+    def __init__(self, data):
+        """
+        Args:
+            data: The decoded payload array
+        """
+        if not isinstance(data, list) or not data:
+            raise ValueError("Nuxt payload must be a non-empty array")
+        self.data = data
+        self._resolved = {}
+
+    @classmethod
+    def loads(cls, content):
+        """Decode the text (or bytes) of a __NUXT_DATA__ script"""
+        return cls(JsonCodec.loads(content))
+
+    @property
+    def root(self):
+        """The top-level value of the payload"""
+        return self.resolve(0)
+
+    def resolve(self, index):
+        """Get the value at a payload index: a primitive, or a NuxtObject/NuxtList view"""
+        if index < 0:
+            return self.SPECIAL_VALUES.get(index)
+        node = self.data[index]
+        if not isinstance(node, (dict, list)):
+            return node
+        value = self._resolved.get(index, _UNRESOLVED)
+        if value is _UNRESOLVED:
+            value = self._resolved[index] = self._resolve(node)
+        return value
+
+    def _resolve(self, node):
+        if isinstance(node, dict):
+            return NuxtObject(self, node)
+        if not node or not isinstance(node[0], str):
+            return NuxtList(self, node)
+
+        # Typed values
+        node_type = node[0]
+        if node_type in self.WRAPPER_TYPES:
+            return self.resolve(node[1])
+        if node_type in self.EMPTY_TYPES:
+            return None
+        if node_type in ("Date", "RegExp", "URL"):
+            return node[1]
+        if node_type == "BigInt":
+            return int(node[1])
+        if node_type == "Set":
+            return NuxtList(self, node[1:])
+        if node_type == "Map":
+            return {self.to_python(node[i]): self.to_python(node[i + 1]) for i in range(1, len(node) - 1, 2)}
+        if node_type == "null":
+            return NuxtObject(self, {node[i]: node[i + 1] for i in range(1, len(node) - 1, 2)})
+        # Custom reducers wrap their payload the same way as the Nuxt wrappers
+        return self.resolve(node[1]) if len(node) > 1 else None
+
+    def to_python(self, index):
+        """Fully decode the value at a payload index into plain dicts and lists"""
+        value = self.resolve(index)
+        return value.to_python() if isinstance(value, (NuxtObject, NuxtList)) else value
+
+    def find(self, *keys):
+        """Get the first object that has all of the given keys, or None"""
+        for index, node in enumerate(self.data):
+            if isinstance(node, dict) and all(key in node for key in keys):
+                return self.resolve(index)
+        return None
+
+
+class NuxtObject(Mapping):
+    """Dict-like view of a payload object whose values are resolved on access"""
+
+    __slots__ = ("payload", "node")
+
+    def __init__(self, payload, node):
+        self.payload = payload
+        self.node = node
+
+    def __getitem__(self, key):
+        return self.payload.resolve(self.node[key])
+
+    def __contains__(self, key):
+        return key in self.node
+
+    def __iter__(self):
+        return iter(self.node)
+
+    def __len__(self):
+        return len(self.node)
+
+    def path(self, *keys, default=None):
+        """Follow a chain of keys (or list positions), returning default where it breaks off"""
+        value = self
+        for key in keys:
+            try:
+                value = value[key]
+            except (KeyError, IndexError, TypeError):
+                return default
+        return default if value is None else value
+
+    def to_python(self):
+        """Fully decode this object into plain dicts and lists"""
+        return {key: self.payload.to_python(index) for key, index in self.node.items()}
+
+    def __repr__(self):
+        return f"NuxtObject({list(self.node)})"
+
+
+class NuxtList(Sequence):
+    """List-like view of a payload array whose items are resolved on access"""
+
+    __slots__ = ("payload", "node")
+
+    def __init__(self, payload, node):
+        self.payload = payload
+        self.node = node
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return NuxtList(self.payload, self.node[position])
+        return self.payload.resolve(self.node[position])
+
+    def __iter__(self):
+        resolve = self.payload.resolve
+        return (resolve(index) for index in self.node)
+
+    def __len__(self):
+        return len(self.node)
+
+    def to_python(self):
+        """Fully decode this array into plain lists and dicts"""
+        return [self.payload.to_python(index) for index in self.node]
+
+    def __repr__(self):
+        return f"NuxtList({len(self.node)} items)"
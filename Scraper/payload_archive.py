@@ -0,0 +1,160 @@
+""" payload_archive.py - Archive of raw __NUXT_DATA__ payloads, so listings can be re-extracted without re-scraping. """
+import os
+import re
+import struct
+import time
+import zlib
+from functools import lru_cache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class PayloadArchive:
+    """
+    Append-only segments of raw listing payloads, keyed by listing ID and fetch time.
+
+    Each entry is one frame: a header with the listing ID, fetch time and lengths, then the
+    listing URL and the payload, compressed on its own so entries can be decoded in any order
+    and in other processes. Payloads are compressed with zstd when the zstandard package is
+    installed and with zlib otherwise; the codec is part of the segment name, so archives
+    written either way stay readable. A segment is closed once it grows past max_segment_bytes,
+    and a frame torn by a crash is cut off before the next write.
+    """
+
+    FRAME_HEADER = struct.Struct(">QdHI")  # listing ID, fetch time, URL length, payload length
+    SEGMENT_PATTERN = re.compile(r"^payloads-(\d+)\.(zst|zlib)$")
+
+    def __init__(self, directory, max_segment_bytes=256 * 1024 * 1024, codec=None):
+        """
+        Args:
+            directory: Directory holding the segments
+            max_segment_bytes: Size after which a new segment is started
+            codec: "zst" or "zlib", defaults to zstd when zstandard is installed
+        """
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.codec = codec or ("zst" if zstandard else "zlib")
+        if self.codec == "zst" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        os.makedirs(self.directory, exist_ok=True)
+
+        segments = self.segments()
+        self.active_segment = segments[-1][0] if segments else 0
+        self.active_size = 0
+        if segments and segments[-1][1] == self.codec:
+            self.active_size = self._repair_segment(segments[-1][2])
+        if not segments or segments[-1][1] != self.codec or self.active_size >= self.max_segment_bytes:
+            self.active_segment += 1 if segments else 0
+            self.active_size = 0
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def compressor(codec):
+        """Compression function of a codec, created once per process"""
+        if codec == "zst":
+            return zstandard.ZstdCompressor(level=9).compress
+        return lambda data: zlib.compress(data, 6)
+
+    @staticmethod
+    def compress(codec, payload):
+        """Compress a payload (bytes or str) for the archive; picklable so it can run in a worker process"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        return PayloadArchive.compressor(codec)(payload)
+
+    @staticmethod
+    def decompress(codec, data):
+        """Decompress a payload stored with the given codec"""
+        if codec == "zst":
+            if zstandard is None:
+                raise ValueError("reading zstd segments requires the zstandard package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def _segment_path(self, number, codec=None):
+        return os.path.join(self.directory, f"payloads-{number:06d}.{codec or self.codec}")
+
+    def segments(self):
+        """List (number, codec, path) of all segments, oldest first"""
+        matches = [match for match in map(self.SEGMENT_PATTERN.match, os.listdir(self.directory)) if match]
+        return sorted((int(match.group(1)), match.group(2), os.path.join(self.directory, match.group(0)))
+                      for match in matches)
+
+    def _repair_segment(self, path):
+        """Truncate a segment after its last complete frame; return its size"""
+        end = 0
+        for end, *_ in self._iter_frames(path, read_payloads=False):
+            pass
+        if end != os.path.getsize(path):
+            with open(path, 'rb+') as segment:
+                segment.truncate(end)
+        return end
+
+    def add(self, house_id, url, payload, fetched_at=None):
+        """
+        Append the payload of a listing.
+
+        Args:
+            house_id: Listing ID
+            url: Listing URL
+            payload: Raw __NUXT_DATA__ script content (bytes or str)
+            fetched_at: Time the page was fetched, defaults to now
+        """
+        self.add_compressed(house_id, url, self.compress(self.codec, payload), fetched_at)
+
+    def add_compressed(self, house_id, url, compressed, fetched_at=None):
+        """Append a payload already compressed with this archive's codec, e.g. in a worker process"""
+        url_bytes = url.encode("utf-8")
+        frame = self.FRAME_HEADER.pack(house_id, fetched_at or time.time(), len(url_bytes), len(compressed))
+        with open(self._segment_path(self.active_segment), 'ab') as segment:
+            segment.write(frame + url_bytes + compressed)
+        self.active_size += len(frame) + len(url_bytes) + len(compressed)
+        if self.active_size >= self.max_segment_bytes:
+            self.active_segment += 1
+            self.active_size = 0
+
+    def _iter_frames(self, path, read_payloads=True):
+        """Yield (end offset, house_id, fetched_at, url, compressed payload) of each complete frame"""
+        header_size = self.FRAME_HEADER.size
+        with open(path, 'rb') as segment:
+            offset = 0
+            while True:
+                header = segment.read(header_size)
+                if len(header) < header_size:
+                    return
+                house_id, fetched_at, url_length, payload_length = self.FRAME_HEADER.unpack(header)
+                url = segment.read(url_length)
+                if read_payloads:
+                    payload = segment.read(payload_length)
+                    if len(payload) < payload_length:
+                        return
+                else:
+                    payload = None
+                    segment.seek(payload_length, os.SEEK_CUR)
+                offset += header_size + url_length + payload_length
+                if len(url) < url_length or (not read_payloads and offset > os.fstat(segment.fileno()).st_size):
+                    return
+                yield offset, house_id, fetched_at, url.decode("utf-8"), payload
+
+    def iter_entries(self, latest_only=True):
+        """
+        Yield (house_id, url, fetched_at, codec, compressed payload) for the archived payloads.
+
+        Payloads are left compressed so callers can decompress them in worker processes.
+        With latest_only, only the most recent payload of each listing is yielded.
+        """
+        latest = None
+        if latest_only:
+            latest = {}
+            for number, codec, path in self.segments():
+                for end, house_id, fetched_at, _, _ in self._iter_frames(path, read_payloads=False):
+                    if house_id not in latest or fetched_at >= latest[house_id][1]:
+                        latest[house_id] = (number, fetched_at, end)
+
+        for number, codec, path in self.segments():
+            for end, house_id, fetched_at, url, payload in self._iter_frames(path):
+                if latest is None or latest[house_id] == (number, fetched_at, end):
+                    yield house_id, url, fetched_at, codec, payload
@@ -1,39 +1,115 @@
 import asyncio
 import os
-import json
 import time
-from random import randint
 from curl_cffi.requests import AsyncSession
 from Scraper.url_builder import UrlBuilder
 from Scraper.collector import Collector
 from Scraper.scraper import Scraper
-from Scraper.utils import QueryUtils, CleanerUtils
+from Scraper.utils import QueryUtils, CleanerUtils, CommonFunctions, TtlCache
 from Scraper.config import Config
+from Scraper.dates import DutchDateParser
+from Scraper.concurrency import TokenBucket, AdaptiveConcurrency, ProcessPoolBatcher, RetryPolicy, StageStats, WorkerPool
+from Scraper.storage import BufferedRecordWriter, JsonFileStorage
 import sys
 
 class FundaScraperPipeline:
-    def __init__(self, base_dir=None):
+    def __init__(self, base_dir=None, offline=False):
         self.config = Config(base_dir=base_dir)
+        if offline:
+            self.config.response_cache_offline = True
         self.url_builder = UrlBuilder()
         self.collector = Collector()
         self.scraper = Scraper()
+        self.parser = None
+        CommonFunctions.rate_limiter = TokenBucket(
+            rate=self.config.requests_per_second,
+            burst=self.config.request_burst,
+            stage_shares=self.config.stage_rate_shares
+        )
+        CommonFunctions.concurrency = AdaptiveConcurrency(
+            initial=self.config.concurrency_initial,
+            minimum=self.config.concurrency_min,
+            maximum=self.config.batch_processing_size,
+            healthy_latency=self.config.healthy_latency
+        )
+        CommonFunctions.retry_policy = RetryPolicy(
+            max_attempts=self.config.retry_max_attempts,
+            base_delay=self.config.retry_base_delay,
+            factor=self.config.retry_backoff_factor,
+            max_delay=self.config.retry_max_delay
+        )
+        UrlBuilder.result_count_cache = TtlCache(ttl=self.config.result_count_ttl)
+        CommonFunctions.response_cache = self.response_cache = self.config.get_response_cache()
+        # Offline replays re-read cached pages, which are already archived
+        archive_payloads = self.config.archive_payloads and not self.config.response_cache_offline
+        Scraper.payload_archive = self.config.get_payload_archive() if archive_payloads else None
 
         self.scraped_data_dir = self.config.scraped_data_dir
+        self.storage = self.config.get_storage()
         self.search_query = self.config.load_search_query()
-        self.available_location_queries = self.config.load_location_queries()
+        self.location_catalog = self.config.load_location_catalog()
         self.scraped_ids = self.config.get_scraped_ids()
+        self.journal = self.config.get_completion_journal()
+        self.dead_letters = self.config.get_dead_letter_store()
         self.scraped_neighborhoods = self.config.get_scraped_neighborhoods()
+        self.scraped_areas = self.config.get_scraped_areas()
+        # Listings queued during this run, so concurrently scraped areas never fetch the same one twice
+        self.claimed_ids = set()
 
         self.search_queries = QueryUtils.create_queries_for_selected_areas(
-            self.search_query, self.available_location_queries
+            self.search_query, self.location_catalog
         )
 
     def save_house_data(self, house_info, output_dir=None):
-        if not output_dir:
-            output_dir = self.scraped_data_dir
-        house_id = int(house_info["link"].strip("/").split("/")[-1])
-        with open(f'{output_dir}/{house_id}.json', 'w') as outfile:
-            json.dump(house_info, outfile)
+        storage = JsonFileStorage(output_dir) if output_dir else self.storage
+        storage.write_records(self.drop_records_without_id([house_info]))
+
+    def save_house_records(self, houses):
+        houses = self.drop_records_without_id(houses)
+        self.storage.write_records(houses)
+        self.scraped_ids.update(house["ID"] for house in houses)
+        for house in houses:
+            self.dead_letters.resolve(house["link"])
+
+    def drop_records_without_id(self, houses):
+        # A record is stored under its listing ID, so one whose URL has none cannot be saved
+        with_id = [house for house in houses if house.get("ID") is not None]
+        for house in houses:
+            if house.get("ID") is None:
+                print(f"\nSkipping {house.get('link')}: no listing ID in its URL")
+        return with_id
+
+    def record_failed_page(self, source):
+        def page_failed(page_url, error, attempts):
+            if self.config.response_cache_offline:
+                return  # Only missing from the cache
+            self.dead_letters.record("page", page_url, error, attempts, source=source)
+        return page_failed
+
+    def record_failed_house(self, source):
+        def house_failed(link, error, attempts):
+            if self.config.response_cache_offline:
+                return
+            # A removed listing will not come back, so it is dropped instead of kept for a retry
+            if getattr(error, "status_code", None) in (404, 410):
+                self.dead_letters.resolve(link)
+            else:
+                self.dead_letters.record("detail", link, error, attempts, source=source)
+        return house_failed
+
+    def select_links_to_scrape(self, links):
+        # Only new listings, and stored ones past the refresh window, need their detail page fetched
+        now = time.time()
+        selected_links = []
+        for link in links:
+            house_id = CommonFunctions.get_house_id(link)
+            if house_id in self.claimed_ids:
+                continue
+            if house_id is None or house_id not in self.scraped_ids or self.config.is_stale(house_id, now):
+                if house_id is not None:
+                    self.claimed_ids.add(house_id)
+                selected_links.append(link)
+        return selected_links
 
     def print_progress_bar(self, current, total, prefix='', suffix='', length=50, fill='█'):
         percent = ("{0:.1f}").format(100 * (current / float(total)))
@@ -44,106 +120,344 @@ class FundaScraperPipeline:
         if current == total:
             sys.stdout.write('\n')
 
-    async def process_and_save(self, url, session):
-        # First, collect all the links
-        print("📋 Collecting house listings...")
-        batch_size = self.config.batch_processing_size
-        result = await self.collector.fetch_house_links_from_multiple_pages_async(url, session, batch_size = batch_size) 
-        unscraped_links = list(result)
-        print(f"🔍 Found {len(unscraped_links)} listings to process")
-        
+    async def process_and_save(self, url, session, number_results=None, label=None):
+        # Links are collected page by page and fed to the detail workers as they arrive. Search
+        # pages that fail for good are dead-lettered and counted, so the caller can leave the
+        # area or neighborhood out of the journal and crawl it again on the next run.
+        record_failed_page = self.record_failed_page(label or url)
+        pages_failed = 0
+
+        def page_failed(page_url, error, attempts):
+            nonlocal pages_failed
+            pages_failed += 1
+            record_failed_page(page_url, error, attempts)
+
+        link_batches = self.collector.iter_house_links(
+            url, session, batch_size=self.config.batch_processing_size,
+            number_results=number_results, results_per_page=self.config.results_per_page,
+            on_failed=page_failed
+        )
+        houses_saved, houses_processed = await self.scrape_links(link_batches, session, label=label)
+        return houses_saved, houses_processed, pages_failed
+
+    async def scrape_links(self, link_batches, session, label=None):
+        prefix = f"{label}: " if label else ""
+        print(f"📋 {prefix}Collecting and processing house listings...")
+        link_queue = asyncio.Queue(maxsize=self.config.link_queue_size)
+        found_links = set()
+        queued_links = 0
+
+        async def collect_links():
+            nonlocal queued_links
+            try:
+                async for page_links in link_batches:
+                    new_links = page_links - found_links
+                    found_links.update(new_links)
+                    for link in self.select_links_to_scrape(new_links):
+                        await link_queue.put(link)
+                        queued_links += 1
+            finally:
+                await link_queue.put(WorkerPool.DONE)
+
+        # Records are written as they are produced, in periodic flushes, so memory stays flat
+        writer = BufferedRecordWriter(
+            self.save_house_records,
+            flush_size=self.config.save_flush_size,
+            flush_interval=self.config.save_flush_interval
+        )
+
+        # Detail pages flow through bounded queues: fetch -> parse -> clean -> persist. A full
+        # queue makes the stage feeding it wait, so pages and records never pile up in memory
+        # when parsing or writing falls behind, and each stage's timing shows the bottleneck.
+        queue_sizes = self.config.stage_queue_size
+        concurrency = {stage: self.config.get_stage_concurrency(stage) for stage in ("fetch", "parse", "clean", "persist")}
+        page_queue = asyncio.Queue(maxsize=queue_sizes["parse"])
+        house_queue = asyncio.Queue(maxsize=queue_sizes["clean"])
+        record_queue = asyncio.Queue(maxsize=queue_sizes["persist"])
+        stats = {
+            "fetch": StageStats("fetch", link_queue),
+            "parse": StageStats("parse", page_queue),
+            "clean": StageStats("clean", house_queue),
+            "persist": StageStats("persist", record_queue),
+        }
+
         # Setup for progress tracking
-        houses_saved = 0
-        total_links = len(unscraped_links)
-        
-        # Process houses in batches, with progress updates
-        scraped_data = []
-        
-        for i in range(0, total_links, batch_size):
-            batch = unscraped_links[i:i+batch_size]
-            batch_results = await self.scraper.process_multiple_houses(batch, session, batch_size)
-            scraped_data.extend(batch_results)
-            
-            # Update progress
-            progress = min(i + batch_size, total_links)
-            self.print_progress_bar(progress, total_links, 
-                                    prefix=f'Progress:', 
-                                    suffix=f'({progress}/{total_links})')
-        
-        # Save the new houses
-        houses_to_save = [house for house in scraped_data if house["ID"] not in self.scraped_ids]
-        
-        print(f"\n💾 Saving {len(houses_to_save)} new properties...")
-        for i, new_house in enumerate(houses_to_save):
-            self.save_house_data(new_house)
-            self.scraped_ids.add(new_house["ID"])
-            houses_saved += 1
-            
-            # Update save progress
-            self.print_progress_bar(i + 1, len(houses_to_save), 
-                                   prefix='Saving:', 
-                                   suffix=f'({i+1}/{len(houses_to_save)})')
-
-        return houses_saved, len(unscraped_links)
-
-    async def run(self):
+        progress = 0
+
+        def link_finished():
+            nonlocal progress
+            progress += 1
+            queue_depths = " ".join(f"{name}:{stage.queue.qsize()}" for name, stage in stats.items())
+            # Units scraped at the same time share the line, so the bar names its own
+            self.print_progress_bar(progress, max(queued_links, progress), 
+                                    prefix=f'{label}:' if label else 'Progress:', 
+                                    suffix=f'({progress}/{queued_links} queued) window={CommonFunctions.concurrency.current_window} queues={queue_depths}')
+
+        async def fetch(link):
+            return await self.scraper.fetch_house_page(link, session, stats["fetch"])
+
+        house_failed = self.record_failed_house(label)
+
+        def fetch_failed(link, error, attempts):
+            house_failed(link, error, attempts)
+            link_finished()
+
+        loop = asyncio.get_running_loop()
+
+        async def parse(page):
+            # Extraction and payload compression run off the event loop; only the append stays here
+            if self.parser:
+                house_info, payload = await self.parser.submit(page)
+            else:
+                house_info, payload = await loop.run_in_executor(None, Scraper.extract_house_page, page)
+            if not house_info:
+                link_finished()
+                return None
+            Scraper.archive_payload(house_info, payload)
+            return house_info
+
+        async def run_off_loop(func, *args):
+            if self.parser:
+                return await self.parser.call(func, *args)
+            return await loop.run_in_executor(None, func, *args)
+
+        async def clean(house_infos):
+            # Records are cleaned column by column, a whole queued batch per call
+            return await run_off_loop(CleanerUtils.clean_scraped_records, house_infos)
+
+        async def clean_one(house_info):
+            # A batch that failed is cleaned record by record, so only the bad records are lost
+            return await run_off_loop(CleanerUtils.clean_scraped_record, house_info)
+
+        def clean_failed(house_info, error, attempts):
+            house_failed(house_info["link"], error, attempts)
+            link_finished()
+
+        async def persist(house):
+            writer.add(house)
+            link_finished()
+
+        # Every stage works while the collector is still filling the link queue
+        with writer:
+            await asyncio.gather(
+                collect_links(),
+                WorkerPool.run_stage(link_queue, page_queue, fetch, concurrency["fetch"], stats["fetch"],
+                                     retry_policy=CommonFunctions.retry_policy, on_failed=fetch_failed),
+                WorkerPool.run_stage(page_queue, house_queue, parse, concurrency["parse"], stats["parse"]),
+                WorkerPool.run_batch_stage(house_queue, record_queue, clean, self.config.clean_batch_size,
+                                           concurrency["clean"], stats["clean"], item_handler=clean_one,
+                                           on_failed=clean_failed),
+                WorkerPool.run_stage(record_queue, None, persist, concurrency["persist"], stats["persist"])
+            )
+        houses_saved = writer.records_written
+        print(f"\n🔍 {prefix}Found {len(found_links)} listings, {len(found_links) - queued_links} already stored, {queued_links} processed")
+        print(f"💾 {prefix}Saved {houses_saved} new or refreshed properties")
+        print(f"⏱️ {prefix}Stage timings:")
+        for stage in stats.values():
+            print(f"   {stage.summary()}")
+
+        return houses_saved, len(found_links)
+
+    async def retry_failed(self, session):
+        # Only the dead-lettered search pages and listings are fetched; listings found on the
+        # recovered pages go through the usual selection, so stored ones are still skipped
+        page_urls = self.dead_letters.urls("page")
+        detail_urls = []
+        for link in self.dead_letters.urls("detail"):
+            if CommonFunctions.get_house_id(link) in self.scraped_ids:
+                self.dead_letters.resolve(link)  # Stored since it failed
+            else:
+                detail_urls.append(link)
+        print(f"🔁 Retrying {len(page_urls)} search pages and {len(detail_urls)} listings that failed before")
+
+        async def link_batches():
+            if detail_urls:
+                yield set(detail_urls)
+            async for page_url, links in self.collector.iter_page_links(
+                page_urls, session, batch_size=self.config.batch_processing_size,
+                on_failed=self.record_failed_page(None)
+            ):
+                self.dead_letters.resolve(page_url)
+                yield links
+
+        houses_saved, _ = await self.scrape_links(link_batches(), session, label="Retry")
+        self.dead_letters.compact()
+        print(f"📮 {len(self.dead_letters)} URLs still failing, kept in {self.dead_letters.path}")
+        return houses_saved
+
+    async def run(self, retry_failed=False):
         total_start_time = time.time()
         print("🏠 Starting Funda housing data collection...")
+        # Relative listing dates ("3 weken", "Vandaag") all resolve against the start of this run
+        CleanerUtils.date_parser = DutchDateParser()
+
+        if self.config.parse_in_processes:
+            self.parser = ProcessPoolBatcher(
+                Scraper.extract_house_page,
+                workers=self.config.parse_workers,
+                chunk_size=self.config.parse_chunk_size
+            )
+        try:
+            await self._run(total_start_time, retry_failed)
+            if self.response_cache:
+                print(f"🗄️ Response cache: {self.response_cache.hits} pages served, {self.response_cache.misses} fetched or missing")
+        finally:
+            # Segments still being compressed are swapped in before the run ends
+            self.storage.close()
+            if self.parser:
+                self.parser.shutdown()
+                self.parser = None
+
+    async def _run(self, total_start_time, retry_failed=False):
 
         async with AsyncSession() as session:
-            await session.get("https://www.funda.nl/")
-            print("✓ Connected to Funda")
+            if self.config.response_cache_offline:
+                print("✓ Offline: replaying pages from the response cache")
+            else:
+                await CommonFunctions.rate_limiter.acquire()
+                await session.get("https://www.funda.nl/")
+                print("✓ Connected to Funda")
+
+            if retry_failed:
+                total_houses_saved = await self.retry_failed(session)
+                total_time = time.time() - total_start_time
+                print(f"\n✨ Retry complete! Saved {total_houses_saved} properties to {self.storage.directory}")
+                print(f"⏱️ Total execution time: {total_time:.2f} seconds ({total_time / 60:.2f} minutes)")
+                return
 
             params = {k: v for k, v in self.search_query.items() if k != 'selected_area'}
             total_houses_saved = 0
             areas_processed = 0
 
-            for area in self.search_queries:
+            # Areas and neighborhoods are units of work on one shared stack. An oversized area pushes
+            # its neighborhoods on top, so whichever worker is free picks them up next and the run is
+            # never serialized behind one large area while small units wait. All units share the
+            # request rate limiter and concurrency window, so running more of them adds no load.
+            unit_queue = asyncio.LifoQueue()
+            units_pending = 0
+            neighborhood_progress = {}
+
+            def schedule(units):
+                nonlocal units_pending
+                units_pending += len(units)
+                for unit in reversed(units):
+                    unit_queue.put_nowait(unit)
+
+            def unit_done(unit, result):
+                nonlocal units_pending
+                units_pending -= 1
+                if not units_pending:
+                    unit_queue.put_nowait(WorkerPool.DONE)
+
+            async def process_area(area):
+                nonlocal total_houses_saved, areas_processed
                 area_start_time = time.time()
                 url = self.url_builder.build_url(selected_area=area, **params)
-                number_observations = self.url_builder.get_number_results(url)
-                print(f"\n📍 Area: {area} - {number_observations} listings found")
+                if url in self.scraped_areas:
+                    print(f"\n↷ Skipping {area} (already scraped)")
+                    return
+                number_observations = await self.url_builder.get_number_results_async(url, session)
+                if number_observations is None:
+                    # The count probe failed; page through the results until one comes back empty
+                    print(f"\n📍 Area: {area} - number of listings unknown")
+                else:
+                    print(f"\n📍 Area: {area} - {number_observations} listings found")
 
-                if number_observations < 9900:
-                    houses_saved, houses_processed = await self.process_and_save(url, session)
+                if number_observations is None or number_observations < 9900:
+                    houses_saved, houses_processed, pages_failed = await self.process_and_save(
+                        url, session, number_observations, label=area
+                    )
+                    if pages_failed:
+                        print(f"⚠️ {area}: {pages_failed} search pages failed, not marking it as scraped")
+                    else:
+                        self.journal.record("area", area, url, houses_processed, houses_saved)
                     total_houses_saved += houses_saved
                     areas_processed += 1
 
                     area_time = time.time() - area_start_time
-                    print(f"✓ {area}: Processed {houses_processed} listings, saved {houses_saved} new properties ({area_time:.2f} seconds)")
+                    print(f"✓ {area}: Processed {houses_processed} listings, saved {houses_saved} new properties ({area_time:.2f} seconds, window={CommonFunctions.concurrency.current_window})")
                 else:
                     print(f"⚠️ {area} has too many listings, processing by neighborhood...")
-                    neighborhoods_processed = 0
-                    neighborhood_houses_saved = 0
-                    neighborhoods_total = len(self.search_queries[area])
-
+                    neighborhood_units = []
                     for neighborhood in self.search_queries[area]:
-                        neighborhood_start_time = time.time()
-                        if neighborhood in self.scraped_neighborhoods:
+                        neighborhood_url = self.url_builder.build_url(selected_area=neighborhood, **params)
+                        if neighborhood_url in self.scraped_neighborhoods:
                             print(f"  ↷ Skipping {neighborhood} (already scraped)")
                             continue
+                        neighborhood_units.append((area, neighborhood, neighborhood_url))
 
-                        try:
-                            neighborhood_url = self.url_builder.build_url(selected_area=neighborhood, **params)
-                            houses_saved, houses_processed = await self.process_and_save(neighborhood_url, session)
-                            neighborhood_houses_saved += houses_saved
-                            neighborhoods_processed += 1
+                    neighborhood_progress[area] = {
+                        "url": url,
+                        "start_time": area_start_time,
+                        "total": len(self.search_queries[area]),
+                        "pending": len(neighborhood_units),
+                        "processed": 0,
+                        "failed": 0,
+                        "houses_saved": 0,
+                        "houses_processed": 0,
+                    }
+                    if neighborhood_units:
+                        # Probe all neighborhood counts at once and hand each unit its count
+                        counts = await self.url_builder.get_number_results_many([unit[2] for unit in neighborhood_units], session)
+                        schedule([unit + (counts.get(unit[2]),) for unit in neighborhood_units])
+                    else:
+                        finish_area(area)
 
-                            neighborhood_time = time.time() - neighborhood_start_time
-                            print(f"  ✓ {neighborhood}: Saved {houses_saved} new properties ({neighborhood_time:.2f} seconds)")
-                        except Exception as e:
-                            print(f"  ✗ Error in {neighborhood}: {str(e)[:50]}...")
+            async def process_neighborhood(area, neighborhood, neighborhood_url, neighborhood_observations):
+                progress = neighborhood_progress[area]
+                neighborhood_start_time = time.time()
+                try:
+                    houses_saved, houses_processed, pages_failed = await self.process_and_save(
+                        neighborhood_url, session, neighborhood_observations, label=neighborhood
+                    )
+                    progress["houses_saved"] += houses_saved
+                    progress["houses_processed"] += houses_processed
+                    if pages_failed:
+                        # Leaves the area out of the journal too
+                        progress["failed"] += 1
+                        print(f"  ⚠️ {neighborhood}: {pages_failed} search pages failed, not marking it as scraped")
+                    else:
+                        self.journal.record("neighborhood", neighborhood, neighborhood_url, houses_processed, houses_saved)
+                        progress["processed"] += 1
 
-                    total_houses_saved += neighborhood_houses_saved
-                    areas_processed += 1
-                    area_time = time.time() - area_start_time
-                    print(f"✓ {area}: Processed {neighborhoods_processed}/{neighborhoods_total} neighborhoods, saved {neighborhood_houses_saved} properties ({area_time:.2f} seconds)")
+                    neighborhood_time = time.time() - neighborhood_start_time
+                    print(f"  ✓ {neighborhood}: Saved {houses_saved} new properties ({neighborhood_time:.2f} seconds)")
+                except Exception as e:
+                    progress["failed"] += 1
+                    print(f"  ✗ Error in {neighborhood}: {str(e)[:50]}...")
+                finally:
+                    progress["pending"] -= 1
+                    if not progress["pending"]:
+                        finish_area(area)
+
+            def finish_area(area):
+                nonlocal total_houses_saved, areas_processed
+                progress = neighborhood_progress.pop(area)
+                if not progress["failed"]:
+                    self.journal.record("area", area, progress["url"], progress["houses_processed"], progress["houses_saved"])
+                total_houses_saved += progress["houses_saved"]
+                areas_processed += 1
+                area_time = time.time() - progress["start_time"]
+                print(f"✓ {area}: Processed {progress['processed']}/{progress['total']} neighborhoods, saved {progress['houses_saved']} properties ({area_time:.2f} seconds)")
+
+            async def process_unit(unit):
+                if isinstance(unit, tuple):
+                    await process_neighborhood(*unit)
+                else:
+                    await process_area(unit)
+
+            schedule(list(self.search_queries))
+            if not units_pending:
+                unit_queue.put_nowait(WorkerPool.DONE)
+            await WorkerPool.run_from_queue(
+                unit_queue, process_unit, concurrency=self.config.unit_concurrency, on_done=unit_done, keep_results=False
+            )
 
             total_time = time.time() - total_start_time
-            print(f"\n✨ Collection complete! Processed {areas_processed} areas, saved {total_houses_saved} new properties to {self.scraped_data_dir}")
+            print(f"\n✨ Collection complete! Processed {areas_processed} areas, saved {total_houses_saved} new properties to {self.storage.directory}")
             print(f"⏱️ Total execution time: {total_time:.2f} seconds ({total_time / 60:.2f} minutes)")
 
 # Entry point for execution
 if __name__ == "__main__":
-    scraper = FundaScraperPipeline()
-    asyncio.run(scraper.run())
\ No newline at end of file
+    scraper = FundaScraperPipeline(offline="--offline" in sys.argv)
+    asyncio.run(scraper.run(retry_failed="--retry-failed" in sys.argv))
\ No newline at end of file
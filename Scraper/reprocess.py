@@ -0,0 +1,114 @@
+""" reprocess.py - Re-extract and re-clean archived listing payloads on all cores, without any network access. """
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from Scraper.config import Config
+from Scraper.dates import DutchDateParser
+from Scraper.nuxt import NuxtPayload
+from Scraper.payload_archive import PayloadArchive
+from Scraper.scraper import Scraper
+from Scraper.utils import CleanerUtils
+
+
+def reprocess_payloads(entries):
+    """
+    Extract and clean a chunk of archived payloads; runs in a worker process.
+
+    Relative listing dates ("3 weken") are resolved against the day each payload was fetched,
+    so reprocessed records match what a scrape on that day produced.
+
+    Args:
+        entries: (house_id, url, fetched_at, codec, compressed payload) tuples
+
+    Returns:
+        Tuple of (cleaned records, number of payloads that could not be extracted)
+    """
+    by_day = {}
+    failed = 0
+    for house_id, url, fetched_at, codec, payload in entries:
+        try:
+            house_info = Scraper.collect_house_info(NuxtPayload.loads(PayloadArchive.decompress(codec, payload)))
+        except Exception as e:
+            print(f"Failed to extract archived payload of {house_id}: {e}")
+            house_info = None
+        if not house_info:
+            failed += 1
+            continue
+        house_info["link"] = url
+        house_info["ID"] = house_id
+        by_day.setdefault(datetime.fromtimestamp(fetched_at).date(), []).append(house_info)
+
+    records = []
+    for day, house_infos in by_day.items():
+        CleanerUtils.date_parser = DutchDateParser(reference_time=datetime.combine(day, datetime.min.time()))
+        records.extend(CleanerUtils.clean_scraped_records(house_infos))
+    return records, failed
+
+
+def iter_chunks(entries, chunk_size):
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reprocess_archive(config=None, workers=None, chunk_size=500):
+    """
+    Rebuild the stored records of every archived listing from its latest payload.
+
+    The archive is read in the main process while worker processes decompress, extract and
+    clean chunks of payloads; at most two chunks per worker are in flight, so memory stays
+    bounded however large the archive is.
+
+    Args:
+        config: Config whose archive and storage backend are used, defaults to Config()
+        workers: Number of worker processes, None for os.cpu_count()
+        chunk_size: Payloads per task sent to a worker
+
+    Returns:
+        Tuple of (records written, payloads that could not be extracted)
+    """
+    config = config or Config()
+    archive = config.get_payload_archive()
+    storage = config.get_storage()
+    scraped_ids = config.get_scraped_ids()
+    written = failed = 0
+    start_time = time.time()
+
+    def collect(future):
+        nonlocal written, failed
+        records, chunk_failed = future.result()
+        storage.write_records(records)
+        scraped_ids.update(record["ID"] for record in records)
+        written += len(records)
+        failed += chunk_failed
+        print(f"\rReprocessed {written} listings ({written / max(time.time() - start_time, 1e-9):.0f}/s)", end="")
+
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for chunk in iter_chunks(archive.iter_entries(), chunk_size):
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            in_flight.add(executor.submit(reprocess_payloads, chunk))
+        for future in in_flight:
+            collect(future)
+    print()
+    return written, failed
+
+
+if __name__ == "__main__":
+    # Re-extract all archived listings into the configured storage: python -m Scraper.reprocess [workers]
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    start_time = time.time()
+    written, failed = reprocess_archive(workers=workers)
+    print(f"Rebuilt {written} listings from the payload archive ({failed} failed) in {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,127 @@
+""" response_cache.py - Compressed on-disk cache of fetched pages, for re-runs without re-downloading. """
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+class CachedBody(bytes):
+    """Page body served from the response cache rather than fetched, so callers can tell replays apart"""
+
+
+class ResponseCache:
+    """
+    Stores fetched page bodies under data/http_cache/, one zlib-compressed file per URL.
+
+    Each file starts with the time the page was fetched, so search and detail pages can expire
+    after different TTLs. When the cache grows beyond max_bytes the least recently written
+    pages are evicted. In offline mode expired pages are still served and nothing is written,
+    so a run can be replayed entirely from the cache. set() may be called from several threads,
+    so pages can be compressed and written off the event loop.
+    """
+
+    HEADER = struct.Struct(">d")  # Fetch time in seconds since the epoch
+
+    def __init__(self, directory, ttls=None, default_ttl=None, max_bytes=2 * 1024 ** 3, offline=False,
+                 compression_level=6):
+        """
+        Args:
+            directory: Directory holding the cache files
+            ttls: {stage: seconds} a page fetched for that stage stays fresh; None means forever
+            default_ttl: TTL for stages missing from ttls
+            max_bytes: Size the cache is trimmed back to when it grows beyond it
+            offline: Serve every cached page regardless of age and never write
+            compression_level: zlib level for stored bodies
+        """
+        self.directory = directory
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+        self._sizes = None  # {path: size}, scanned on the first write
+        self._total_bytes = 0
+        self._lock = threading.Lock()  # Guards the size bookkeeping and eviction
+
+    def path_for(self, url):
+        """Cache file of a URL"""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url, stage="detail"):
+        """Get the cached body of a URL, or None if it is missing or older than the stage's TTL"""
+        try:
+            with open(self.path_for(url), "rb") as file:
+                content = file.read()
+            (fetched_at,) = self.HEADER.unpack_from(content)
+            ttl = self.ttls.get(stage, self.default_ttl)
+            if not self.offline and ttl is not None and time.time() - fetched_at > ttl:
+                self.misses += 1
+                return None
+            body = zlib.decompress(content[self.HEADER.size:])
+        except (OSError, struct.error, zlib.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedBody(body)
+
+    def set(self, url, body, fetched_at=None):
+        """Store the body of a fetched URL, evicting the oldest pages if the cache grows too large"""
+        if self.offline:
+            return
+        path = self.path_for(url)
+        content = self.HEADER.pack(fetched_at or time.time()) + zlib.compress(body, self.compression_level)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(content)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            sizes = self._get_sizes()
+            self._total_bytes += len(content) - sizes.get(path, 0)
+            sizes[path] = len(content)
+            if self._total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _get_sizes(self):
+        if self._sizes is None:
+            self._sizes = {}
+            for path, stat in self._scan():
+                self._sizes[path] = stat.st_size
+            self._total_bytes = sum(self._sizes.values())
+        return self._sizes
+
+    def _scan(self):
+        try:
+            shards = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+        except OSError:
+            return
+        for shard in shards:
+            for entry in os.scandir(shard):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    yield entry.path, entry.stat()
+
+    def evict(self, target_bytes):
+        """Delete the least recently written pages until the cache holds at most target_bytes"""
+        with self._lock:
+            self._evict(target_bytes)
+
+    def _evict(self, target_bytes):
+        sizes = self._get_sizes()
+        for path, stat in sorted(self._scan(), key=lambda item: item[1].st_mtime):
+            if self._total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= sizes.pop(path, stat.st_size)
+
+    def clear(self):
+        """Delete every cached page"""
+        self.evict(0)
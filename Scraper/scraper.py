@@ -3,44 +3,83 @@ import os
 import csv
 from bs4 import BeautifulSoup
 from curl_cffi.requests import AsyncSession
-import json
 import time
-from random import randint
 import re
 from Scraper.utils import CommonFunctions, CleanerUtils
+from Scraper.nuxt import NuxtPayload, NuxtObject, NuxtList
+from Scraper.payload_archive import PayloadArchive
+from Scraper.response_cache import CachedBody
 
 clean_scraped_record = CleanerUtils.clean_scraped_record
 
 class Scraper:
     """Handles scraping individual property listings"""
 
+    # Listing object in the Nuxt payload: normally at index 4, otherwise the first object with these keys
+    LISTING_INDEX = 4
+    LISTING_KEYS = ('address', 'features', 'objectType')
+    # Top-level listing fields, as {output key: key path from the listing object}
+    LISTING_FIELDS = {
+        'category': ('objectType',),
+    }
+    ADDRESS_FIELDS = {
+        'address': ('addressTitle',),
+        'neighborhood': ('neighborhood', 'name'),
+        'city': ('city',),
+        'postcode': ('postcode',),
+        'province': ('province',),
+    }
+    # Optional PayloadArchive that keeps the raw payload of every fetched listing
+    payload_archive = None
+
     # 1. Helper Methods (Utility functions)
     @staticmethod
     def collect_row_info(node):
-        """Extract label and value from a data row"""
-        if 'EnergyLabel' in node:
-            value_idx = node['EnergyLabel']
-        elif 'Value' in node:
-            value_idx = node['Value']
-        else:
-            value_idx = None
+        """Extract label and value from a data row, or (None, None) if it has no label or value"""
+        value_key = 'EnergyLabel' if 'EnergyLabel' in node else 'Value' if 'Value' in node else None
+        label_key = 'Label' if 'Label' in node else 'Id' if 'Id' in node else None
+        if value_key is None or label_key is None:
+            return None, None
 
-        if 'Label' in node:
-            id_index = node['Label']
-        elif 'Id' in node:
-            id_index = node['Id']
-        else:
-            id_index = None
-
-        return id_index, value_idx
+        value = node[value_key]
+        if isinstance(value, (NuxtObject, NuxtList)):
+            value = value.to_python()
+        return node[label_key], value
 
     @staticmethod
-    def is_row(data, idx_node):
+    def is_row(node):
         """Check if section is a row or category in the table"""
-        idx = data[idx_node]['KenmerkenList']
-        return data[idx] == []
+        return len(node['KenmerkenList']) == 0
+
+    @staticmethod
+    def find_listing(payload):
+        """Get the listing object of a Nuxt payload, or None"""
+        listing = payload.resolve(Scraper.LISTING_INDEX) if len(payload.data) > Scraper.LISTING_INDEX else None
+        if isinstance(listing, NuxtObject) and all(key in listing for key in Scraper.LISTING_KEYS):
+            return listing
+        return payload.find(*Scraper.LISTING_KEYS)
 
     # 2. Data Extraction Methods
+    @staticmethod
+    def extract_house_data(html):
+        """Extract property data from the raw HTML of an individual listing page"""
+        if not html:
+            return None
+        
+        return Scraper.extract_house_data_from_script(
+            CommonFunctions.extract_script_content(html, 'id', '__NUXT_DATA__')
+        )
+
+    @staticmethod
+    def extract_house_data_from_script(script_content):
+        """Extract property data from the content of a listing page's __NUXT_DATA__ script"""
+        if script_content:
+            try:
+                return Scraper.collect_house_info(NuxtPayload.loads(script_content))
+            except Exception as e:
+                print(f"Failed to extract house data: {e}")
+        return None
+
     @staticmethod
     def extract_house_data_from_soup(soup):
         """Extract property data from an individual listing page"""
@@ -50,33 +89,33 @@ class Scraper:
         script_tag = soup.find('script', id="__NUXT_DATA__")
         if script_tag:
             try:
-                data = json.loads(script_tag.string)
-                return Scraper.collect_house_info(data)
+                return Scraper.collect_house_info(NuxtPayload.loads(script_tag.string))
             except Exception as e:
                 print(f"Failed to extract house data: {e}")
         return None
 
     @staticmethod
-    def collect_house_info(data):
-        """Process raw JSON data into structured property information"""
+    def collect_house_info(payload):
+        """Process a Nuxt payload (or its raw array) into structured property information"""
         try:
-            global_path = data[4]
-            address_path = global_path['address']
-            features_path = data[global_path['features']]
-            category_path = global_path['objectType']
-            saleshistory_path = global_path.get('salesHistory', -1)
-            
+            if not isinstance(payload, NuxtPayload):
+                payload = NuxtPayload(payload)
+            listing = Scraper.find_listing(payload)
+            if listing is None:
+                raise ValueError("no listing object in payload")
+
             house_info = {}
-            house_info['category'] = data[category_path]
+            for key, path in Scraper.LISTING_FIELDS.items():
+                house_info[key] = listing.path(*path)
             
             # Collect address information
-            Scraper.collect_address(data, address_path, house_info)
+            Scraper.collect_address(listing, house_info)
             
             # Collect property features
-            Scraper.collect_features(data, features_path, house_info)
+            Scraper.collect_features(listing['features'], house_info)
             
             # Collect sales history if available
-            Scraper.collect_saleshistory(data, saleshistory_path, house_info)
+            Scraper.collect_saleshistory(listing.path('salesHistory', 'rows'), house_info)
             
             return house_info
         except Exception as e:
@@ -84,127 +123,117 @@ class Scraper:
             return None
 
     @staticmethod
-    def collect_address(data, address_path, house_info):
+    def collect_address(listing, house_info):
         """Extract address information from property data"""
         try:
-            address_section = data[address_path]
-            title_path = address_section['addressTitle']
-            neighborhood_section = data[address_section['neighborhood']]
-            neighborhood_path = neighborhood_section['name']
-            city_path = address_section['city']
-            postcode_path = address_section['postcode']
-            province_path = address_section['province']
-            
-            # Update house_info directly
-            house_info['address'] = data[title_path]
-            house_info['neighborhood'] = data[neighborhood_path]
-            house_info['city'] = data[city_path]
-            house_info['postcode'] = data[postcode_path]
-            house_info['province'] = data[province_path]
+            address_section = listing['address']
+            for key, path in Scraper.ADDRESS_FIELDS.items():
+                value = address_section.path(*path)
+                if value is not None:
+                    house_info[key] = value
         except Exception as e:
             print(f"Error collecting address: {e}")
 
     @staticmethod
-    def collect_features(data, features_path, house_info):
+    def collect_features(features, house_info):
         """Extract property features from data"""
         try:
-            for first_node in features_path:  # Iterate over all elements in features_path
-                stack = [first_node]  # Initialize stack for each new first_node
+            for first_node in features:  # Iterate over all sections of the features table
+                stack = [first_node]  # Initialize stack for each new section
                 while stack:
-                    idx_node = stack.pop()
-                    node = data[idx_node]
+                    node = stack.pop()
                     
-                    if 'KenmerkenList' in node:
-                        if Scraper.is_row(data, idx_node):
-                            id_index, value_idx = Scraper.collect_row_info(node)
-                            if id_index is not None and value_idx is not None:
-                                house_info[data[id_index]] = data[value_idx]
-                        else:
-                            idx = node['KenmerkenList']
-                            stack.extend(data[idx])
+                    if 'KenmerkenList' in node and not Scraper.is_row(node):
+                        stack.extend(node['KenmerkenList'])
                     else:
-                        id_index, value_idx = Scraper.collect_row_info(node)
-                        if id_index is not None and value_idx is not None:
-                            house_info[data[id_index]] = data[value_idx]
+                        label, value = Scraper.collect_row_info(node)
+                        if label is not None:
+                            house_info[label] = value
         except Exception as e:
             print(f"Error collecting features: {e}")
 
     @staticmethod
-    def collect_saleshistory(data, saleshistory_path, house_info):
+    def collect_saleshistory(rows, house_info):
         """Extract sales history from property data"""
-        if saleshistory_path == -1:
+        if rows is None:
             return
             
         try:
-            saleshistory_section = data[saleshistory_path]['rows']
-            for idx_node in data[saleshistory_section]:
-                node = data[idx_node]
-                id_index, value_idx = Scraper.collect_row_info(node)
-                house_info[data[id_index]] = data[value_idx]
+            for node in rows:
+                label, value = Scraper.collect_row_info(node)
+                if label is not None:
+                    house_info[label] = value
         except Exception as e:
             print(f"Error collecting sales history: {e}")
 
     # 3. Main Processing Methods
     @staticmethod
-    async def fetch_house_description_page(url, session):
-        """Fetch an individual property listing page and extract data"""
-        soup = await CommonFunctions.fetch_html_from_url(url, session)
-        if soup:
-            return Scraper.extract_house_data_from_soup(soup)
-        return None
+    def extract_house_page(page):
+        """
+        Extract the raw record of a fetched page; picklable so it can run in a worker process.
+
+        The __NUXT_DATA__ script is located once and, when the page names an archive codec,
+        also compressed here for the payload archive, so neither costs time on the event loop.
+
+        Args:
+            page: (url, html, archive_codec) as returned by fetch_house_page; archive_codec is
+                None when the payload should not be archived
+
+        Returns:
+            Tuple of (record or None, compressed payload or None)
+        """
+        url, html, archive_codec = page
+        script_content = CommonFunctions.extract_script_content(html, 'id', '__NUXT_DATA__') if html else None
+        house_info = Scraper.extract_house_data_from_script(script_content)
+        if not house_info:
+            return None, None
+        house_info["link"] = url
+        house_info["ID"] = CommonFunctions.get_house_id(url)
+        payload = None
+        if archive_codec and house_info["ID"] is not None:
+            payload = PayloadArchive.compress(archive_codec, script_content)
+        return house_info, payload
 
     @staticmethod
-    async def process_single_house(url, session):
-        """Fetch and clean a record for a single property listing"""
-        house_info = await Scraper.fetch_house_description_page(url, session)
+    def parse_house_page(page):
+        """Parse and clean a fetched page into the record the pipeline would store"""
+        house_info, _ = Scraper.extract_house_page(page)
         if house_info:
-            house_info["link"] = url
-            house_info["ID"] = int(url.strip("/").split("/")[-1])
-            #clean_scraped_record(house_info)  # This is imported directly from cleaner module
             return CleanerUtils.clean_scraped_record(house_info)
         return None
 
-    # 4. Async Methods
     @staticmethod
-    async def process_multiple_houses(unscraped_links, session=None, batch_size=10):
-        """Process multiple house links in batches, optionally using an existing session"""
-        all_house_data = []
-        
-        # If no session is provided, create a new one
-        if session is None:
-            async with AsyncSession() as new_session:
-                await new_session.get("https://www.funda.nl/")  # Initial request to set up session
-                return await Scraper._process_multiple_houses_internal(
-                    unscraped_links, new_session, batch_size
-                )
-        else:
-            # Use the provided session
-            return await Scraper._process_multiple_houses_internal(
-                unscraped_links, session, batch_size
-            )
+    def archive_payload(house_info, payload):
+        """Append a payload compressed by extract_house_page to the payload archive"""
+        if payload is not None and Scraper.payload_archive is not None:
+            Scraper.payload_archive.add_compressed(house_info["ID"], house_info["link"], payload)
 
     @staticmethod
-    async def _process_multiple_houses_internal(unscraped_links, session, batch_size):
-        """Internal method to process multiple house links with a given session"""
-        all_house_data = []
+    async def fetch_house_page(url, session, stats=None):
+        """
+        Fetch a property listing page as a (url, html, archive_codec) page for extract_house_page.
+
+        archive_codec is the payload archive's codec, or None when there is no archive or the
+        page was replayed from the response cache (and so was archived when it was fetched).
         
-        # Process links in batches to control concurrency
-        for i in range(0, len(unscraped_links), batch_size):
-            await asyncio.sleep(1 + randint(0, 3))
-            
-            current_batch_urls = unscraped_links[i:i + batch_size]
-            current_batch_tasks = [
-                Scraper.process_single_house(link, session) 
-                for link in current_batch_urls
-            ]
-            current_batch_results = await asyncio.gather(*current_batch_tasks)
-            
-            # Filter out None results and add valid ones to the list
-            for result in current_batch_results:
-                if result:
-                    all_house_data.append(result)
+        stats is an optional StageStats told how long the request waited for its budget.
+
+        Raises FetchError when the page cannot be fetched, so the worker pool can retry it later.
+        """
+        html = await CommonFunctions.fetch_page(url, session, stats=stats)
+        archive = Scraper.payload_archive
+        archive_codec = archive.codec if archive is not None and not isinstance(html, CachedBody) else None
+        return url, html, archive_codec
+
+    @staticmethod
+    async def process_single_house(url, session):
+        """
+        Fetch, parse and clean the record of a single property listing, as the pipeline does.
         
-        return all_house_data
+        Raises FetchError when the page cannot be fetched.
+        """
+        page = await Scraper.fetch_house_page(url, session)
+        return Scraper.parse_house_page(page)
 
 
 async def main():
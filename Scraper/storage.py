@@ -0,0 +1,413 @@
+""" storage.py - Persistence of scraped property records. """
+import asyncio
+import gzip
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from Scraper.codec import JsonCodec
+
+
+class BufferedRecordWriter:
+    """Buffers records as they are produced and writes them out in periodic flushes"""
+
+    def __init__(self, write_records, flush_size=50, flush_interval=10.0):
+        """
+        Args:
+            write_records: Callable that persists a list of records
+            flush_size: Flush once this many records are buffered
+            flush_interval: Flush buffered records at most this many seconds after the last flush,
+                even if no further records arrive (on a timer when used inside an event loop)
+        """
+        self.write_records = write_records
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.records_written = 0
+        self._last_flush = time.monotonic()
+        self._flush_handle = None
+
+    def add(self, record):
+        """Buffer a record, flushing if the buffer is full or the interval has passed"""
+        self.buffer.append(record)
+        self.maybe_flush()
+        if self.buffer:
+            self._schedule_flush()
+
+    def maybe_flush(self):
+        """Flush if the buffer is full or the flush interval has passed"""
+        if (len(self.buffer) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def _schedule_flush(self):
+        """Make sure buffered records get flushed when the interval ends, even if fetching stalls"""
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # Used outside an event loop: flushes happen on add and on exit only
+            return
+        delay = max(0.0, self.flush_interval - (time.monotonic() - self._last_flush))
+        self._flush_handle = loop.call_later(delay, self.flush)
+
+    def flush(self):
+        """Write out all buffered records"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self.buffer:
+            records, self.buffer = self.buffer, []
+            self.write_records(records)
+            self.records_written += len(records)
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+class JsonFileStorage:
+    """Stores each listing as its own {id}.json file (the original layout)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, house_id):
+        return os.path.join(self.directory, f"{house_id}.json")
+
+    def write_records(self, records):
+        """Write each record to its own file, replacing any earlier version"""
+        for record in records:
+            with open(self._path(record["ID"]), 'wb') as outfile:
+                JsonCodec.dump(record, outfile)
+
+    def get_ids(self):
+        """Get the set of stored listing IDs"""
+        return {int(re.findall(r'\d+', x)[0]) for x in os.listdir(self.directory)
+                if re.findall(r'\d+', x)}
+
+    def get_fetch_time(self, house_id):
+        """Get the time a listing was last saved, or None if it is not stored"""
+        try:
+            return os.path.getmtime(self._path(house_id))
+        except OSError:
+            return None
+
+    def close(self):
+        """Nothing to finish; every record is written to its file right away"""
+
+    def iter_records(self):
+        """Yield every stored record"""
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, filename), mode='rb') as file:
+                        yield JsonCodec.load(file)
+                except Exception:
+                    continue
+
+
+class SegmentedStorage:
+    """
+    Stores listings in append-only JSONL segments, indexed by listing ID.
+
+    Records are appended to an active segment-NNNNNN.jsonl file; once it grows past
+    max_segment_bytes it is sealed into a .jsonl.gz made of independently compressed blocks
+    of about BLOCK_BYTES, and a new segment is started. index.tsv maps each listing ID to
+    the byte location of its latest version and the time it was saved, so reading a listing
+    decompresses one block instead of the whole segment and refreshed listings simply append
+    a newer version. A missing or damaged index is rebuilt from the segments.
+    """
+
+    SEGMENT_PATTERN = re.compile(r"^segment-(\d+)\.jsonl(\.gz)?$")
+    BLOCK_BYTES = 256 * 1024
+    # Block of a record in the (uncompressed) active segment; its offset is then a file offset
+    ACTIVE_BLOCK = -1
+    READ_ERRORS = (OSError, EOFError, zlib.error)
+
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.index_file = os.path.join(self.directory, "index.tsv")
+        os.makedirs(self.directory, exist_ok=True)
+
+        segment_numbers = [int(match.group(1)) for match in map(self.SEGMENT_PATTERN.match, os.listdir(self.directory))
+                           if match]
+        self.active_segment = max(segment_numbers, default=0)
+        self._index = None
+        self._seal_executor = None
+        self._pending_seals = {}  # Segment number -> future of its compression
+        sealed_twice = [number for number in set(segment_numbers)
+                        if os.path.exists(self._segment_path(number, sealed=True))
+                        and os.path.exists(self._segment_path(number))]
+        if sealed_twice:
+            # Crashed while sealing, after the sealed copy was complete
+            for number in sealed_twice:
+                os.remove(self._segment_path(number))
+            self.rebuild_index()
+        if os.path.exists(self._segment_path(self.active_segment, sealed=True)):
+            self.active_segment += 1
+        self._repair_active_segment()
+
+    def _segment_path(self, number, sealed=False):
+        return os.path.join(self.directory, f"segment-{number:06d}.jsonl" + (".gz" if sealed else ""))
+
+    def _repair_active_segment(self):
+        """Terminate a line torn by a crash so new records start on their own line"""
+        try:
+            with open(self._segment_path(self.active_segment), 'rb+') as file:
+                if file.seek(0, os.SEEK_END) > 0:
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b"\n":
+                        file.write(b"\n")
+        except OSError:
+            pass
+
+    @property
+    def index(self):
+        """ID -> (segment, block, offset, saved_at) of the latest stored version, loaded on first use"""
+        if self._index is None:
+            self._index = {}
+            try:
+                with open(self.index_file, mode='r', encoding='utf-8') as file:
+                    for line in file:
+                        house_id, segment, block, offset, saved_at = line.split("\t")
+                        self._index[int(house_id)] = (int(segment), int(block), int(offset), float(saved_at))
+            except FileNotFoundError:
+                if any(map(self.SEGMENT_PATTERN.match, os.listdir(self.directory))):
+                    self.rebuild_index()
+            except (OSError, ValueError):  # Torn or pre-block-format index
+                self.rebuild_index()
+        return self._index
+
+    def _index_line(self, house_id, entry):
+        return f"{house_id}\t{entry[0]}\t{entry[1]}\t{entry[2]}\t{entry[3]}\n"
+
+    def write_records(self, records):
+        """Append records to the active segment and index them"""
+        if not records:
+            return
+        saved_at = time.time()
+        index_lines = []
+        with open(self._segment_path(self.active_segment), 'ab') as segment:
+            offset = segment.tell()
+            for record in records:
+                line = JsonCodec.dumps_line(record)
+                segment.write(line)
+                entry = (self.active_segment, self.ACTIVE_BLOCK, offset, saved_at)
+                self.index[record["ID"]] = entry
+                index_lines.append(self._index_line(record["ID"], entry))
+                offset += len(line)
+        with open(self.index_file, 'a', encoding='utf-8') as index:
+            index.writelines(index_lines)
+
+        if offset >= self.max_segment_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """
+        Seal the active segment into compressed blocks, move its index entries there and start a new segment.
+
+        New records go to the next segment right away. Inside an event loop the compression runs
+        on the storage's own thread, so a large segment does not stall the loop, and the sealed
+        segment is swapped in on the loop once it is written; close() waits for that.
+        """
+        number = self.active_segment
+        if not os.path.exists(self._segment_path(number)):
+            return
+        # File offset of each record in the active segment -> listing ID, for records current now
+        current = {entry[2]: house_id for house_id, entry in self.index.items()
+                   if entry[0] == number and entry[1] == self.ACTIVE_BLOCK}
+        self.active_segment += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # Used outside an event loop, e.g. by reprocess: seal in place
+            self._finish_seal(number, self._seal_segment(self._segment_path(number), current))
+            return
+
+        if self._seal_executor is None:
+            self._seal_executor = ThreadPoolExecutor(max_workers=1)
+        future = self._seal_executor.submit(self._seal_segment, self._segment_path(number), current)
+        self._pending_seals[number] = future
+        asyncio.wrap_future(future, loop=loop).add_done_callback(lambda _: self._finish_pending_seal(number))
+
+    def _finish_pending_seal(self, number):
+        future = self._pending_seals.pop(number, None)
+        if future is None:
+            return  # Already finished by close()
+        try:
+            relocated = future.result()
+        except OSError as e:
+            # The segment stays uncompressed; its records are still readable where they are
+            print(f"Error sealing segment {number}: {e}")
+            return
+        self._finish_seal(number, relocated)
+
+    def close(self):
+        """Wait for segments still being sealed and swap them in"""
+        for number in sorted(self._pending_seals):
+            self._pending_seals[number].exception()  # Wait, without raising
+            self._finish_pending_seal(number)
+        if self._seal_executor is not None:
+            self._seal_executor.shutdown()
+            self._seal_executor = None
+
+    @classmethod
+    def _seal_segment(cls, active_path, current):
+        """
+        Compress a segment into a temporary sealed file; safe to run off the event loop.
+
+        Returns:
+            {house_id: (file offset, block, offset in block)} of the current records
+        """
+        relocated = {}
+        with open(active_path, 'rb') as source, open(active_path + ".gz.tmp", 'wb') as target:
+            lines, block_lines, file_offset, block_size = [], [], 0, 0
+            for line in source:
+                lines.append(line)
+                block_lines.append((file_offset, block_size))
+                file_offset += len(line)
+                block_size += len(line)
+                if block_size >= cls.BLOCK_BYTES:
+                    cls._write_block(target, b"".join(lines), block_lines, current, relocated)
+                    lines, block_lines, block_size = [], [], 0
+            if lines:
+                cls._write_block(target, b"".join(lines), block_lines, current, relocated)
+        return relocated
+
+    def _finish_seal(self, number, relocated):
+        """Swap a sealed segment in for its uncompressed one and point its records' index entries at it"""
+        sealed_path = self._segment_path(number, sealed=True)
+        os.replace(sealed_path + ".tmp", sealed_path)
+        index_lines = []
+        for house_id, (file_offset, block, offset) in relocated.items():
+            entry = self.index.get(house_id)
+            # Records written again since the seal started already point at a newer segment
+            if entry is None or entry[:3] != (number, self.ACTIVE_BLOCK, file_offset):
+                continue
+            entry = (number, block, offset, entry[3])
+            self.index[house_id] = entry
+            index_lines.append(self._index_line(house_id, entry))
+        with open(self.index_file, 'a', encoding='utf-8') as index:
+            index.writelines(index_lines)
+        os.remove(self._segment_path(number))
+
+    @staticmethod
+    def _write_block(target, data, block_lines, current, relocated):
+        """Compress one block of lines into the sealed segment, recording where current records moved"""
+        block = target.tell()
+        target.write(gzip.compress(data))
+        for file_offset, block_offset in block_lines:
+            house_id = current.get(file_offset)
+            if house_id is not None:
+                relocated[house_id] = (file_offset, block, block_offset)
+
+    @staticmethod
+    def _read_block(file):
+        """Decompress the gzip member starting at the file's position"""
+        decompressor = zlib.decompressobj(wbits=31)
+        parts = []
+        consumed = 0
+        while not decompressor.eof:
+            chunk = file.read(64 * 1024)
+            if not chunk:
+                raise EOFError("Compressed segment ended mid-block")
+            parts.append(decompressor.decompress(chunk))
+            consumed += len(chunk) - len(decompressor.unused_data)
+        parts.append(decompressor.flush())
+        return b"".join(parts), consumed
+
+    def _iter_segment_lines(self, number):
+        """Yield (block, offset, line) for each line of a segment"""
+        sealed_path = self._segment_path(number, sealed=True)
+        try:
+            if os.path.exists(sealed_path):
+                with open(sealed_path, 'rb') as file:
+                    block = 0
+                    while file.peek(1)[:1]:
+                        data, size = self._read_block(file)
+                        offset = 0
+                        for line in data.splitlines(keepends=True):
+                            yield block, offset, line
+                            offset += len(line)
+                        block += size
+                        file.seek(block)
+            else:
+                with open(self._segment_path(number), 'rb') as file:
+                    offset = 0
+                    for line in file:
+                        yield self.ACTIVE_BLOCK, offset, line
+                        offset += len(line)
+        except self.READ_ERRORS:
+            return
+
+    def get_ids(self):
+        """Get the set of stored listing IDs"""
+        return set(self.index)
+
+    def get_fetch_time(self, house_id):
+        """Get the time a listing was last saved, or None if it is not stored"""
+        entry = self.index.get(house_id)
+        return entry[3] if entry else None
+
+    def _segment_mtime(self, number):
+        for sealed in (True, False):
+            try:
+                return os.path.getmtime(self._segment_path(number, sealed))
+            except OSError:
+                continue
+        return time.time()
+
+    def get_record(self, house_id):
+        """Read the latest stored version of a listing, or None"""
+        entry = self.index.get(house_id)
+        if entry is None:
+            return None
+        number, block, offset, _ = entry
+        try:
+            if block == self.ACTIVE_BLOCK:
+                with open(self._segment_path(number), 'rb') as file:
+                    file.seek(offset)
+                    return JsonCodec.loads(file.readline())
+            with open(self._segment_path(number, sealed=True), 'rb') as file:
+                file.seek(block)
+                data, _ = self._read_block(file)
+            end = data.find(b"\n", offset)
+            return JsonCodec.loads(data[offset:end if end != -1 else None])
+        except self.READ_ERRORS + (ValueError,):
+            return None
+
+    def iter_records(self, latest_only=True):
+        """Yield stored records segment by segment, skipping superseded versions unless latest_only is False"""
+        for number in range(self.active_segment + 1):
+            for block, offset, line in self._iter_segment_lines(number):
+                try:
+                    record = JsonCodec.loads(line)
+                except ValueError:  # Torn write at the end of the active segment
+                    continue
+                if latest_only:
+                    entry = self.index.get(record.get("ID"))
+                    if entry is None or entry[:3] != (number, block, offset):
+                        continue
+                yield record
+
+    def rebuild_index(self):
+        """Reconstruct index.tsv from the segments themselves"""
+        self._index = {}
+        numbers = sorted(int(match.group(1)) for match in map(self.SEGMENT_PATTERN.match, os.listdir(self.directory))
+                         if match)
+        for number in dict.fromkeys(numbers):
+            saved_at = self._segment_mtime(number)
+            for block, offset, line in self._iter_segment_lines(number):
+                try:
+                    self._index[JsonCodec.loads(line)["ID"]] = (number, block, offset, saved_at)
+                except (ValueError, KeyError, TypeError):
+                    continue
+        with open(self.index_file, 'w', encoding='utf-8') as index:
+            index.writelines(self._index_line(house_id, entry) for house_id, entry in self._index.items())
@@ -1,4 +1,5 @@
 """ url_builder.py - Constructs search URLs for the Funda housing website. """
+import asyncio
 from typing import Dict, Any, Optional, Union, List
 from urllib.parse import quote_plus
 from curl_cffi import requests
@@ -6,12 +7,19 @@ from lxml import html
 import re
 
 from Scraper.filters import generate_filters, FILTERS
+from Scraper.utils import CommonFunctions, TtlCache
+from Scraper.codec import JsonCodec
 
 class UrlBuilder:
     """Handles building and parsing URLs for property searches on Funda"""
     
     # Define class-level constants
     BASE_URL = "https://www.funda.nl/zoeken/"
+
+    # Result counts per search URL, shared by the GUI and the scraper's probes
+    result_count_cache = TtlCache(ttl=600)
+    # Probes in flight, so concurrent callers asking for the same URL share one request
+    _pending_counts = {}
     
     @staticmethod
     def build_url(
@@ -63,11 +71,49 @@ class UrlBuilder:
             
         return url
     
+    @staticmethod
+    def parse_number_results(page) -> Optional[int]:
+        """
+        Read the number of search results from the raw content of a Funda search page.
+        
+        Prefers the total in the page's embedded ld+json (numberOfItems) and falls back to
+        the number in the results heading. A numberOfItems no larger than the listings on the
+        page may only count that page, so it is not trusted on its own.
+        
+        Args:
+            page: Raw page content (bytes or str)
+            
+        Returns:
+            Number of search results or None if not found, so callers page until the results end
+        """
+        script_content = CommonFunctions.extract_script_content(page, 'type', 'application/ld+json')
+        if script_content:
+            try:
+                data = JsonCodec.loads(script_content)
+                for item in data if isinstance(data, list) else [data]:
+                    if isinstance(item, dict) and isinstance(item.get('numberOfItems'), int):
+                        listed = item['numberOfItems']
+                        # A total larger than the listings on this page cannot be a per-page count
+                        if listed > len(item.get('itemListElement') or []):
+                            return listed
+            except ValueError:
+                pass
+
+        tree = html.fromstring(page)
+        for heading in tree.xpath('//*[@id="PageListings"]//h1'):
+            for element in heading.xpath('./div[1]') + [heading]:
+                digits = re.findall(r'\d+', element.text_content())
+                if digits:
+                    return int("".join(digits))
+        return None
+
     @staticmethod
     def get_number_results(search_url, timeout=10) -> Optional[int]:
         """
         Extract the number of search results from a Funda search page.
         
+        Blocking variant for the GUI; the scraper uses get_number_results_async.
+        
         Args:
             search_url: The URL to fetch results from
             timeout: Request timeout in seconds
@@ -75,7 +121,11 @@ class UrlBuilder:
         Returns:
             Number of search results or None if not found
         """
+        cached = UrlBuilder.result_count_cache.get(search_url)
+        if cached is not None:
+            return cached
         try:
+            CommonFunctions.rate_limiter.acquire_sync("probe")
             response = requests.get(
                 search_url,
                 impersonate="chrome",
@@ -83,13 +133,10 @@ class UrlBuilder:
             )
             response.raise_for_status()
             
-            tree = html.fromstring(response.text)
-            element = tree.xpath('//*[@id="PageListings"]/div[5]/div[2]/div[1]/div/h1/div[1]')
-            
-            if element:
-                return int("".join(re.findall(r'\d+', element[0].text_content().strip())))
-            else:
-                return None
+            number_results = UrlBuilder.parse_number_results(response.content)
+            if number_results is not None:
+                UrlBuilder.result_count_cache.set(search_url, number_results)
+            return number_results
                 
         except requests.RequestException as e:
             print(f"Error fetching search results: {e}")
@@ -98,6 +145,64 @@ class UrlBuilder:
             print(f"Error parsing search results: {e}")
             return None
 
+    @staticmethod
+    async def get_number_results_async(search_url, session) -> Optional[int]:
+        """
+        Extract the number of search results from a Funda search page on a shared session.
+        
+        Results are cached per URL for result_count_cache.ttl seconds, and concurrent
+        calls for the same URL share a single request.
+        
+        Args:
+            search_url: The URL to fetch results from
+            session: AsyncSession to send the request on
+            
+        Returns:
+            Number of search results or None if not found
+        """
+        cached = UrlBuilder.result_count_cache.get(search_url)
+        if cached is not None:
+            return cached
+
+        probe = UrlBuilder._pending_counts.get(search_url)
+        if probe is None:
+            probe = asyncio.ensure_future(UrlBuilder._probe_number_results(search_url, session))
+            UrlBuilder._pending_counts[search_url] = probe
+            probe.add_done_callback(lambda _: UrlBuilder._pending_counts.pop(search_url, None))
+        return await asyncio.shield(probe)
+
+    @staticmethod
+    async def _probe_number_results(search_url, session):
+        page = await CommonFunctions.fetch_html_from_url(search_url, session, stage="probe")
+        if not page:
+            return None
+        try:
+            number_results = UrlBuilder.parse_number_results(page)
+        except Exception as e:
+            print(f"Error parsing search results: {e}")
+            return None
+        if number_results is not None:
+            UrlBuilder.result_count_cache.set(search_url, number_results)
+        return number_results
+
+    @staticmethod
+    async def get_number_results_many(search_urls, session) -> Dict[str, Optional[int]]:
+        """
+        Probe the result counts of many search URLs at once.
+        
+        Args:
+            search_urls: Search URLs to probe
+            session: AsyncSession to send the requests on
+            
+        Returns:
+            {search URL: number of results or None}
+        """
+        search_urls = list(dict.fromkeys(search_urls))
+        counts = await asyncio.gather(
+            *(UrlBuilder.get_number_results_async(search_url, session) for search_url in search_urls)
+        )
+        return dict(zip(search_urls, counts))
+
 if __name__ == "__main__":
 
     url = UrlBuilder.build_url(
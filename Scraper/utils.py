@@ -11,61 +11,217 @@ import time
 from random import randint
 from bs4 import BeautifulSoup
 from curl_cffi.requests import AsyncSession
-from datetime import datetime, timedelta
-from typing import List, Union, Dict, Any
+from curl_cffi.requests import exceptions as curl_exceptions
+from typing import List, Optional, Union, Dict, Any
+from functools import lru_cache
+from email.utils import parsedate_to_datetime
+import numpy as np
 import pandas as pd
-from dateutil.parser import parse
+from Scraper.concurrency import TokenBucket, AdaptiveConcurrency, RetryPolicy
+from Scraper.dates import DutchDateParser
+
+
+class FetchError(Exception):
+    """A request that did not return a usable page, classified by HTTP status or failure type"""
+
+    # Statuses worth retrying later; 403 (anti-bot), 404 and other client errors are final
+    RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(self, url, reason, retryable=False, status_code=None, retry_after=None, congested=False):
+        """
+        Args:
+            url: URL that failed
+            reason: Human-readable failure reason
+            retryable: Whether trying again later may succeed
+            status_code: HTTP status, or None if no response arrived
+            retry_after: Seconds the server asked to wait before the next attempt, if any
+            congested: Whether the failure signals server pressure (429, 5xx, timeout)
+        """
+        super().__init__(f"{reason} for {url}")
+        self.url = url
+        self.reason = reason
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.congested = congested
+
+    @classmethod
+    def from_response(cls, url, response):
+        """Classify a response by status code, or return None for a successful one"""
+        status = response.status_code
+        if 200 <= status < 400:
+            return None
+        retry_after = cls.parse_retry_after(response.headers.get("Retry-After"))
+        if status == 403:
+            return cls(url, "Access Forbidden (403): possible anti-bot detection", status_code=status)
+        if status == 429:
+            return cls(url, "Rate limited (429)", True, status, retry_after, congested=True)
+        if status in cls.RETRYABLE_STATUSES or status >= 500:
+            return cls(url, f"Server error ({status})", True, status, retry_after, congested=status >= 500)
+        return cls(url, f"HTTP error ({status})", status_code=status)
+
+    @classmethod
+    def from_exception(cls, url, error):
+        """Classify an exception raised while sending a request"""
+        if isinstance(error, (curl_exceptions.Timeout, asyncio.TimeoutError)):
+            return cls(url, f"Timeout error ({error})", True, congested=True)
+        if isinstance(error, (curl_exceptions.ConnectionError, curl_exceptions.ChunkedEncodingError,
+                              curl_exceptions.IncompleteRead, curl_exceptions.ProxyError)):
+            return cls(url, f"Connection error ({error})", True)
+        response = getattr(error, "response", None)
+        if response is not None and getattr(response, "status_code", None):
+            return cls.from_response(url, response) or cls(url, f"Request failed ({error})")
+        return cls(url, f"Request failed ({error})")
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
 
 
 class CommonFunctions:
+    # Shared by every outgoing request so the total request rate stays predictable
+    rate_limiter = TokenBucket()
+    # Shared AIMD window on in-flight requests, tuned from 429/5xx/timeouts and latency
+    concurrency = AdaptiveConcurrency()
+    # Backoff for failed requests, both for in-place retries and the worker pools' retry scheduler
+    retry_policy = RetryPolicy()
+    request_timeout = 10
+    # Optional ResponseCache consulted before any request is made
+    response_cache = None
+
+    @staticmethod
+    def get_house_id(url):
+        """Parse the listing ID from a property URL, or None if it has no numeric ID"""
+        try:
+            return int(url.strip("/").split("/")[-1])
+        except (ValueError, AttributeError):
+            return None
+
     @staticmethod
-    async def fetch_html_from_url(url, session):
-        """Fetch HTML from a URL with retry logic"""
-        max_retries = 5
-        backoff_factor = 3
-        timeout = 10
+    async def fetch_page(url, session, stage="detail", stats=None):
+        """
+        Fetch the raw HTML bytes of a URL in a single attempt, drawing from the stage's request budget.
+
+        With a response cache set, a fresh cached page is returned without a request, and in
+        offline mode a page missing from the cache fails without one. Fetched pages are compressed
+        into the cache on an executor thread, off the event loop. With stats, the time spent
+        waiting for the concurrency window and rate limiter is reported through stats.add_wait,
+        so it can be told apart from the request itself.
         
-        for attempt in range(max_retries):
+        Raises:
+            FetchError: The request failed or returned a non-2xx status; its `retryable` and
+                `retry_after` tell a worker pool whether and when to requeue the URL
+        """
+        cache = CommonFunctions.response_cache
+        if cache:
+            content = cache.get(url, stage)
+            if content is not None:
+                return content
+            if cache.offline:
+                raise FetchError(url, "Not in response cache (offline)")
+
+        wait_start = time.monotonic()
+        await CommonFunctions.concurrency.acquire()
+        try:
+            await CommonFunctions.rate_limiter.acquire(stage)
+            start_time = time.monotonic()
+            response = await session.get(
+                url, 
+                impersonate="chrome",
+                timeout=CommonFunctions.request_timeout
+            )
+        except asyncio.CancelledError:
+            CommonFunctions.concurrency.release()
+            raise
+        except Exception as e:
+            error = FetchError.from_exception(url, e)
+            CommonFunctions.concurrency.release(congested=error.congested)
+            raise error from e
+
+        error = FetchError.from_response(url, response)
+        CommonFunctions.concurrency.release(time.monotonic() - start_time, error is not None and error.congested)
+        if error:
+            raise error
+        if stats:
+            stats.add_wait(start_time - wait_start)
+        if cache:
+            await asyncio.get_running_loop().run_in_executor(None, cache.set, url, response.content)
+        return response.content
+
+    @staticmethod
+    async def fetch_html_from_url(url, session, stage="detail"):
+        """
+        Fetch the raw HTML bytes of a URL, retrying in place; returns None if it keeps failing.
+        
+        For one-off requests outside a worker pool. Worker pools call fetch_page and let their
+        retry scheduler requeue failed URLs instead of holding a worker during the backoff.
+        """
+        policy = CommonFunctions.retry_policy
+        for attempt in range(1, policy.max_attempts + 1):
             try:
-                response = await session.get(
-                    url, 
-                    impersonate="chrome",
-                    timeout=timeout
-                )
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                return soup
-            
-            except Exception as e:
-                # Handle different types of errors
-                wait_time = backoff_factor ** attempt
-                
-                if "timeout" in str(e).lower():
-                    print(f"Timeout error for {url}: {e}. Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                    continue
-                    
-                if "403" in str(e):
-                    print(f"Access Forbidden (403) for {url}: Possible anti-bot detection. Skipping.")
-                    break
-                    
-                if "429" in str(e):
-                    wait_time *= 2  # Double wait time for rate limits
-                    print(f"Rate limited (429) for {url}. Retrying in {wait_time} seconds...")
+                return await CommonFunctions.fetch_page(url, session, stage)
+            except FetchError as e:
+                if not e.retryable:
+                    print(f"Failed to process URL: {url}. Error: {e}")
+                    return None
+                if attempt < policy.max_attempts:
+                    wait_time = policy.delay(attempt, e.retry_after)
+                    print(f"{e}. Retrying in {wait_time:.1f} seconds...")
                     await asyncio.sleep(wait_time)
-                    continue
-                    
-                if any(str(code) in str(e) for code in range(500, 600)):
-                    print(f"Server error for {url}: {e}. Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                    continue
-                    
-                print(f"Failed to process URL: {url}. Error: {e}")
-                break
         
-        print(f"Skipping URL after {max_retries} retries: {url}")
+        print(f"Skipping URL after {policy.max_attempts} attempts: {url}")
+        return None
+
+    @staticmethod
+    def extract_script_content(content, attribute, value):
+        """
+        Find the body of the first <script> tag whose attribute has the given value.
+
+        Scans the raw response bytes directly instead of building a DOM, and only
+        falls back to a full BeautifulSoup parse when the fast scan finds nothing.
+        
+        Args:
+            content: Raw page content (bytes or str)
+            attribute: Attribute name to match, e.g. 'id' or 'type'
+            value: Attribute value to match, e.g. '__NUXT_DATA__'
+            
+        Returns:
+            Script body (bytes or str), or None if no such script exists
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+
+        opening_tag = CommonFunctions._script_tag_pattern(attribute, value).search(content)
+        if opening_tag:
+            end = content.find(b"</script", opening_tag.end())
+            if end != -1:
+                return content[opening_tag.end():end]
+
+        script_tag = BeautifulSoup(content, 'html.parser').find('script', {attribute: value})
+        if script_tag and script_tag.string:
+            return script_tag.string
         return None
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _script_tag_pattern(attribute, value):
+        """Compiled pattern for an opening <script> tag carrying attribute=value"""
+        return re.compile(
+            rb"<script\b[^>]*?\s" + re.escape(attribute.encode()) + rb"\s*=\s*([\"']?)"
+            + re.escape(value.encode()) + rb"\1(?=[\s>/])[^>]*>",
+            re.IGNORECASE
+        )
+
     @staticmethod
     def save_filters_to_json(filters, filename=None):
         """Save the filter dictionary to a JSON file."""
@@ -82,73 +238,55 @@ class CommonFunctions:
 
 class QueryUtils:
     @staticmethod
-    def create_queries_for_selected_areas(search_query, available_location_queries):
+    def create_queries_for_selected_areas(search_query, location_catalog):
         """
         Create queries for selected areas based on search query and available location queries.
         
         Args:
             search_query (dict): The search query configuration
-            available_location_queries (list): List of available location queries
+            location_catalog (LocationCatalog): Indexed catalog of available location queries
             
         Returns:
             dict: Dictionary with area keys and corresponding query lists
         """
         selected_areas = search_query.get('selected_area', None)
         if selected_areas is None:
-            # Initialize with "All" key
-            stack_neighborhoods_queries = {}
-            
-            # Get all unique gemeente and add them as keys
-            unique_gemeentes = set()
-            for row in available_location_queries:
-                gemeente = CleanerUtils.clean_name(row["gemeente"])
-                unique_gemeentes.add(gemeente)
-            
             # Add each gemeente as a key in the dictionary
-            for gemeente in unique_gemeentes:
-                stack_neighborhoods_queries[f"gemeente-{gemeente}"] = []
-            
-            # Populate the queries for each gemeente
-            for row in available_location_queries:
-                gemeente = CleanerUtils.clean_name(row["gemeente"])
-                queries = eval(row["query"]) if isinstance(row["query"], str) and row["query"] != "[]" else row["query"]
-                stack_neighborhoods_queries[f"gemeente-{gemeente}"].extend(queries)
-        else:
-            # Initialize with selected areas as keys
-            stack_neighborhoods_queries = {area: [] for area in selected_areas}
-            
-            for search_term in selected_areas:
-                # Determine the search type
-                if search_term.startswith("gemeente-"):
-                    search_type = "gemeente"
-                    # Extract the actual gemeente name from the search term
-                    search_value = search_term.replace("gemeente-", "")
-                elif search_term.startswith("provincie-"):
-                    search_type = "provincie"
-                    # Extract the actual provincie name from the search term
-                    search_value = search_term.replace("provincie-", "")
-                else:
-                    search_type = "plaats"
-                    search_value = search_term
-                
-                # Loop through all available location queries
-                for row in available_location_queries:
-                    queries = eval(row["query"]) if isinstance(row["query"], str) and row["query"] != "[]" else row["query"]
-                    
-                    # Match based on search type
-                    if search_type == "plaats" and CleanerUtils.clean_name(row["plaats"]) == search_value:
-                        stack_neighborhoods_queries[search_term].extend(queries)
-                    elif search_type == "gemeente" and CleanerUtils.clean_name(row["gemeente"]) == search_value:
-                        stack_neighborhoods_queries[search_term].extend(queries)
-                    elif search_type == "provincie" and CleanerUtils.clean_name(row["provincie"]) == search_value:
-                        stack_neighborhoods_queries[search_term].extend(queries)
+            return {
+                f"gemeente-{gemeente}": location_catalog.get_queries("gemeente", gemeente)
+                for gemeente in location_catalog.names("gemeente")
+            }
+
+        stack_neighborhoods_queries = {}
+        for search_term in selected_areas:
+            # Determine the search type
+            if search_term.startswith("gemeente-"):
+                search_type = "gemeente"
+                # Extract the actual gemeente name from the search term
+                search_value = search_term.replace("gemeente-", "")
+            elif search_term.startswith("provincie-"):
+                search_type = "provincie"
+                # Extract the actual provincie name from the search term
+                search_value = search_term.replace("provincie-", "")
+            else:
+                search_type = "plaats"
+                search_value = search_term
+
+            stack_neighborhoods_queries[search_term] = list(location_catalog.get_queries(search_type, search_value))
         return stack_neighborhoods_queries
 
 
 class CleanerUtils:
     """Utility class for cleaning scraped records and data."""
     
+    # Resolves relative listing dates; the pipeline replaces it at the start of each run to fix "today"
+    date_parser = DutchDateParser()
+
+    # Characters dropped or replaced by clean_name, applied in a single str.translate pass
+    NAME_TRANSLATION = str.maketrans({"'": None, "(": None, ")": None, ".": None, " ": "-"})
+
     @staticmethod
+    @lru_cache(maxsize=65536)
     def clean_name(name: str) -> str:
         """
         Clean a location name by normalizing it.
@@ -159,26 +297,29 @@ class CleanerUtils:
         Returns:
             Cleaned and normalized string
         """
-        # Remove single quotes
-        name = name.replace("'", "")
-        
-        # Convert to lowercase
-        name = name.lower()
+        # Lowercase, drop quotes, parentheses and periods, and replace spaces with hyphens
+        name = name.lower().translate(CleanerUtils.NAME_TRANSLATION)
         
-        # Replace spaces with hyphens
-        name = name.replace(" ", "-")
-        
-        # Remove parentheses
-        name = re.sub(r"[()]", "", name)
-        
-        # Remove periods
-        name = name.replace(".", "")
-        
-        # Normalize accented characters and replace specific ones
-        name = unicodedata.normalize("NFKD", name)
-        name = name.encode("ascii", "ignore").decode("utf-8")  # Remove diacritics
+        # Normalize accented characters and remove diacritics (nothing to do for plain ASCII)
+        if not name.isascii():
+            name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("utf-8")
         
         return name
+
+    @staticmethod
+    def clean_names(names):
+        """
+        Clean a whole column of location names, normalizing each distinct name once.
+        
+        Args:
+            names: Iterable of names, or a pandas Series
+            
+        Returns:
+            List of cleaned names, or a Series when given a Series
+        """
+        if isinstance(names, pd.Series):
+            return names.map({name: CleanerUtils.clean_name(name) for name in names.unique()})
+        return [CleanerUtils.clean_name(name) for name in names]
     
     @staticmethod
     def clean_price(x: str) -> float:
@@ -236,6 +377,9 @@ class CleanerUtils:
             x = 0
         return int(x)
 
+    ROOM_PATTERN = r"(\d{1,2}\s{1}kamers{0,1})|(\d{1,2}\s{1}rooms{0,1})"
+    BEDROOM_PATTERN = r"(\d{1,2}\s{1}slaapkamers{0,1})|(\d{1,2}\s{1}bedrooms{0,1})"
+
     @staticmethod
     def find_n_room(x: str) -> int:
         """
@@ -247,8 +391,7 @@ class CleanerUtils:
         Returns:
             Number of rooms as an integer
         """
-        pattern = r"(\d{1,2}\s{1}kamers{0,1})|(\d{1,2}\s{1}rooms{0,1})"
-        return CleanerUtils.find_keyword_from_regex(x, pattern)
+        return CleanerUtils.find_keyword_from_regex(x, CleanerUtils.ROOM_PATTERN)
 
     @staticmethod
     def find_n_bedroom(x: str) -> int:
@@ -261,8 +404,7 @@ class CleanerUtils:
         Returns:
             Number of bedrooms as an integer
         """
-        pattern = r"(\d{1,2}\s{1}slaapkamers{0,1})|(\d{1,2}\s{1}bedrooms{0,1})"
-        return CleanerUtils.find_keyword_from_regex(x, pattern)
+        return CleanerUtils.find_keyword_from_regex(x, CleanerUtils.BEDROOM_PATTERN)
 
     @staticmethod
     def find_n_bathroom(x: str) -> int:
@@ -317,52 +459,12 @@ class CleanerUtils:
             x: Date string in various formats
             
         Returns:
-            Standardized date string in 'dd/mm/yyyy' format
-        """
-        x = x.replace("weken", "week")
-        x = x.replace("maanden", "month")
-        x = x.replace("Vandaag", "Today")
-        x = x.replace("+", "")
-        x = CleanerUtils.map_dutch_month(x)
-
-        def delta_now(d: int):
-            t = timedelta(days=d)
-            return datetime.now() - t
-
-        weekdays_dict = {
-            "maandag": "Monday",
-            "dinsdag": "Tuesday",
-            "woensdag": "Wednesday",
-            "donderdag": "Thursday",
-            "vrijdag": "Friday",
-            "zaterdag": "Saturday",
-            "zondag": "Sunday",
-        }
-
-        try:
-            if x.lower() in weekdays_dict.keys():
-                date_string = weekdays_dict.get(x.lower())
-                parsed_date = parse(date_string, fuzzy=True)
-                delta = datetime.now().weekday() - parsed_date.weekday()
-                x = delta_now(delta)
-
-            elif x.find("month") != -1:
-                x = delta_now(int(x.split("month")[0].strip()[0]) * 30)
-            elif x.find("week") != -1:
-                x = delta_now(int(x.split("week")[0].strip()[0]) * 7)
-            elif x.find("Today") != -1:
-                x = delta_now(1)
-            elif x.find("day") != -1:
-                x = delta_now(int(x.split("day")[0].strip()))
-            else:
-                x = datetime.strptime(x, "%d %B %Y")
-            return x.strftime("%d/%m/%Y")
-
-        except ValueError:
-            return "na"
+            Standardized date string in 'dd/mm/yyyy' format, relative to the run's reference time
+        """
+        return CleanerUtils.date_parser.parse(x)
 
     @staticmethod
-    def clean_energy_label(x: str) -> str:
+    def clean_energy_label(x: str) -> Optional[str]:
         """
         Clean and standardize energy label format.
         
@@ -370,8 +472,10 @@ class CleanerUtils:
             x: Energy label string
             
         Returns:
-            Cleaned energy label string
+            Cleaned energy label string, or None if x is missing or not a string
         """
+        if not isinstance(x, str):
+            return None
         try:
             x = x.split(" ")[0]
             if x.find("A+") != -1:
@@ -396,10 +500,7 @@ class CleanerUtils:
                     cleaned_info[key] = CleanerUtils.clean_area(value)
 
         # Handle specific fields safely
-        try:
-            cleaned_info['Bouwjaar'] = int(cleaned_info.get('Bouwjaar', 0))
-        except ValueError:
-            cleaned_info['Bouwjaar'] = 0
+        cleaned_info['Bouwjaar'] = CleanerUtils._clean_year(cleaned_info.get('Bouwjaar', 0))
 
         cleaned_info['Energielabel'] = CleanerUtils.clean_energy_label(cleaned_info.get('Energielabel', ''))
 
@@ -422,14 +523,225 @@ class CleanerUtils:
                 
         return cleaned_info
         
+    # Number formats that convert identically as a whole column and through float()/int() one by one
+    FLOAT_PATTERN = r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+    INT_PATTERN = r"[+-]?[0-9]{1,18}"
+
+    @staticmethod
+    def _clean_column(values: List[Any], clean_strings, clean_value) -> List[Any]:
+        """
+        Clean one column, running the vectorized cleaner once over its distinct strings.
+        
+        Args:
+            values: Column values, one per record
+            clean_strings: Takes a Series of distinct strings and returns an equally long array of cleaned values
+            clean_value: Cleans any other (non-string) value on its own
+            
+        Returns:
+            Cleaned values, one per record
+        """
+        column = pd.Series(values, dtype=object)
+        is_string = column.map(type).eq(str).to_numpy()
+        cleaned = np.empty(len(values), dtype=object)
+        if is_string.any():
+            codes, distinct = pd.factorize(column.to_numpy()[is_string])
+            cleaned[is_string] = np.asarray(clean_strings(pd.Series(distinct, dtype=object)), dtype=object)[codes]
+        for row in np.flatnonzero(~is_string):
+            cleaned[row] = clean_value(values[row])
+        return cleaned.tolist()
+
+    @staticmethod
+    def _parse_numbers(strings: pd.Series, pattern: str, dtype, fallback) -> np.ndarray:
+        """
+        Convert a column of numeric strings in one go.
+        
+        Args:
+            strings: Column of candidate strings (NaN where there is nothing to parse)
+            pattern: Regex a string must fully match to take the vectorized path
+            dtype: float or numpy integer type to convert to
+            fallback: Called with the position of every other cell
+            
+        Returns:
+            Object array of Python numbers
+        """
+        parsed = np.empty(len(strings), dtype=object)
+        is_number = strings.str.fullmatch(pattern, na=False).to_numpy(dtype=bool)
+        parsed[is_number] = strings.to_numpy()[is_number].astype(dtype).tolist()
+        for position in np.flatnonzero(~is_number):
+            parsed[position] = fallback(position)
+        return parsed
+
+    @staticmethod
+    def _clean_amounts(strings: pd.Series) -> np.ndarray:
+        """Vectorized clean_price/clean_area over the strings of any field, leaving other text as is"""
+        cleaned = strings.to_numpy()
+        is_price = strings.str.contains('€', regex=False, na=False).to_numpy(dtype=bool)
+        is_area = ~is_price & (strings.str.contains('m²', regex=False, na=False)
+                               | strings.str.contains('m³', regex=False, na=False)).to_numpy(dtype=bool)
+        if not (is_price.any() or is_area.any()):
+            return cleaned
+        cleaned = cleaned.copy()
+        prices = strings[is_price]
+        cleaned[is_price] = CleanerUtils._parse_numbers(
+            prices.str.split(" ").str[1].str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+            CleanerUtils.FLOAT_PATTERN, float, lambda position: CleanerUtils.clean_price(prices.iloc[position])
+        )
+        areas = strings[is_area]
+        cleaned[is_area] = CleanerUtils._parse_numbers(
+            areas.str.replace(",", ".", regex=False).str.split(" m", regex=False).str[0],
+            CleanerUtils.FLOAT_PATTERN, float, lambda position: CleanerUtils.clean_area(areas.iloc[position])
+        )
+        return cleaned
+
+    @staticmethod
+    def _clean_years(strings: pd.Series) -> np.ndarray:
+        """Vectorized int() of construction years, 0 where that fails"""
+        return CleanerUtils._parse_numbers(
+            strings, CleanerUtils.INT_PATTERN, np.int64,
+            lambda position: CleanerUtils._clean_year(strings.iloc[position])
+        )
+
+    @staticmethod
+    def _clean_year(value: Any) -> Optional[int]:
+        """int() of a construction year, 0 if it is not a number, None if it is missing or not a string or number"""
+        if value is None or not isinstance(value, (str, int, float)):
+            return None
+        try:
+            return int(value)
+        except (ValueError, OverflowError):
+            return 0
+
+    @staticmethod
+    def _clean_energy_labels(strings: pd.Series) -> np.ndarray:
+        """Vectorized clean_energy_label"""
+        labels = strings.str.split(" ").str[0]
+        return labels.mask(labels.str.contains("A+", regex=False, na=False), ">A+").to_numpy()
+
+    @staticmethod
+    def _count_keyword(strings: pd.Series, pattern: str) -> np.ndarray:
+        """Vectorized find_keyword_from_regex: the number in front of the first match, or 0"""
+        first_match = strings.str.extract(pattern)
+        matched = first_match[0].fillna(first_match[1])
+        counts = matched.str.split(" ").str[0].mask(matched.isna(), "0")
+        return CleanerUtils._parse_numbers(
+            counts, r"[0-9]{1,18}", np.int64,
+            lambda position: CleanerUtils.find_keyword_from_regex(strings.iloc[position], pattern)
+        )
+
+    @staticmethod
+    def clean_scraped_records(house_infos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Clean a batch of scraped house records column by column.
+        
+        The records are pivoted into one column per field, and price, area, year, energy
+        label and room extraction run as pandas string operations over each column's
+        distinct values. Cells the fast path cannot parse go through the per-record
+        helpers, so the output is identical to calling clean_scraped_record on each record.
+        
+        Args:
+            house_infos: Raw scraped records
+            
+        Returns:
+            Cleaned records, in the same order
+        """
+        cleaned_infos = [house_info.copy() for house_info in house_infos]
+        keys = dict.fromkeys(key for house_info in house_infos for key in house_info)
+        missing = object()
+
+        # Prices and areas, in whichever field they appear
+        for key in keys:
+            values = [house_info.get(key, missing) for house_info in house_infos]
+            cleaned_values = CleanerUtils._clean_column(values, CleanerUtils._clean_amounts, lambda value: value)
+            for cleaned_info, value, cleaned_value in zip(cleaned_infos, values, cleaned_values):
+                if cleaned_value is not value:
+                    cleaned_info[key] = cleaned_value
+
+        # Handle specific fields
+        years = CleanerUtils._clean_column(
+            [cleaned_info.get('Bouwjaar', 0) for cleaned_info in cleaned_infos],
+            CleanerUtils._clean_years, CleanerUtils._clean_year
+        )
+        labels = CleanerUtils._clean_column(
+            [cleaned_info.get('Energielabel', '') for cleaned_info in cleaned_infos],
+            CleanerUtils._clean_energy_labels, CleanerUtils.clean_energy_label
+        )
+        for cleaned_info, year, label in zip(cleaned_infos, years, labels):
+            cleaned_info['Bouwjaar'] = year
+            cleaned_info['Energielabel'] = label
+
+        # Extract room counts
+        rows = [row for row, cleaned_info in enumerate(cleaned_infos) if 'Aantal kamers' in cleaned_info]
+        if rows:
+            values = [cleaned_infos[row]['Aantal kamers'] for row in rows]
+            n_rooms = CleanerUtils._clean_column(
+                values, lambda strings: CleanerUtils._count_keyword(strings, CleanerUtils.ROOM_PATTERN),
+                CleanerUtils.find_n_room
+            )
+            n_bedrooms = CleanerUtils._clean_column(
+                values, lambda strings: CleanerUtils._count_keyword(strings, CleanerUtils.BEDROOM_PATTERN),
+                CleanerUtils.find_n_bedroom
+            )
+            for row, rooms, bedrooms in zip(rows, n_rooms, n_bedrooms):
+                cleaned_info = cleaned_infos[row]
+                cleaned_info['Kamers'] = rooms
+                cleaned_info['Slaapkamers'] = bedrooms
+                del cleaned_info['Aantal kamers']
+
+        # Date fields, parsing each distinct value once
+        for date_key in ['Aangeboden sinds', 'Verkoopdatum']:
+            rows = [row for row, cleaned_info in enumerate(cleaned_infos) if date_key in cleaned_info]
+
+            def date_error(value, e):
+                print(f"Error processing {date_key}: {e}")
+                return ''
+
+            dates = CleanerUtils.date_parser.parse_many(
+                (cleaned_infos[row][date_key] for row in rows), on_error=date_error
+            )
+            for row, date in zip(rows, dates):
+                cleaned_infos[row][date_key] = date
+
+        return cleaned_infos
+
     @staticmethod
     def clean_string(value: str) -> str:
-        """Cleans a string by removing specific characters and normalizing it."""
-        value = value.replace("'", "").lower()
-        value = value.replace(" ", "-").replace(".", "")
-        value = re.sub(r"[()]", "", value)
-        return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("utf-8")
+        """Cleans a string by removing specific characters and normalizing it (alias of clean_name)."""
+        return CleanerUtils.clean_name(value)
+
+class TtlCache:
+    """In-memory cache whose entries expire a fixed number of seconds after they were stored"""
+
+    def __init__(self, ttl=600.0, max_entries=10000):
+        """
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: Oldest entries are evicted beyond this many
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get(self, key, default=None):
+        """Get a cached value, or default if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            return default
+        return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the oldest entry when the cache is full"""
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic(), value)
+
+    def clear(self):
+        """Drop all entries"""
+        self._entries.clear()
 
 if __name__ == "__main__":
     cleaner = CleanerUtils.clean_name("Gemeente Noord Holland")
-    print(cleaner)
\ No newline at end of file
+    print(cleaner)
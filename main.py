@@ -1,27 +1,37 @@
+import argparse
 import asyncio
 import sys
 import os
 from Interface.interface import show_startup_screen
 from Scraper.pipeline import FundaScraperPipeline
 
-async def run_pipeline():
+async def run_pipeline(retry_failed=False, offline=False):
     """Run the scraper pipeline asynchronously."""
-    scraper = FundaScraperPipeline()
-    await scraper.run()
+    scraper = FundaScraperPipeline(offline=offline)
+    await scraper.run(retry_failed=retry_failed)
 
 def main():
     """Main entry point for the application."""
-    # Display the startup screen from interface.py
-    user_choice_continue = show_startup_screen()
+    parser = argparse.ArgumentParser(description="Scrape housing data from Funda.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="only retry the search pages and listings that failed in earlier runs")
+    parser.add_argument("--offline", action="store_true",
+                        help="replay pages from the response cache without sending any request")
+    args = parser.parse_args()
 
-    # If the user canceled, exit the program
-    if not user_choice_continue:
-        print("\n\nScraping canceled by user. Exiting...")
-        sys.exit(0)
+    # A retry run needs no search settings, so the startup screen is skipped
+    if not args.retry_failed:
+        # Display the startup screen from interface.py
+        user_choice_continue = show_startup_screen()
+
+        # If the user canceled, exit the program
+        if not user_choice_continue:
+            print("\n\nScraping canceled by user. Exiting...")
+            sys.exit(0)
     
     # Run the pipeline asynchronously
     try:
-        asyncio.run(run_pipeline())
+        asyncio.run(run_pipeline(retry_failed=args.retry_failed, offline=args.offline))
     except KeyboardInterrupt:
         print("\n\nScraping interrupted by user. Exiting...")
         sys.exit(0)